@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+"""
+Shared PyAudio Instance
+Initializes PortAudio once per process and terminates it at exit
+"""
+
+import atexit
+import threading
+
+import pyaudio
+
+_pa = None
+_lock = threading.Lock()
+
+def get_pyaudio() -> pyaudio.PyAudio:
+    """Return the process-wide PyAudio instance, creating it on first use"""
+    global _pa
+    with _lock:
+        if _pa is None:
+            _pa = pyaudio.PyAudio()
+            atexit.register(_pa.terminate)
+        return _pa
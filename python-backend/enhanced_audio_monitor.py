@@ -13,12 +13,34 @@ import threading
 from pathlib import Path
 from typing import Dict, List, Optional, Any
 import queue
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import librosa
 import soundfile as sf
 from scipy import signal
 from scipy.stats import entropy
 import matplotlib.pyplot as plt
 
+from audio_features import downsample_to_8k
+from audio_interface import get_pyaudio
+from keyword_matcher import KeywordMatcher
+
+try:
+    from faster_whisper import WhisperModel
+    FASTER_WHISPER_AVAILABLE = True
+except ImportError:
+    FASTER_WHISPER_AVAILABLE = False
+    print("faster-whisper not available")
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Vosk returns its results as JSON strings
+json_loads = orjson.loads if ORJSON_AVAILABLE else json.loads
+
 try:
     import vosk
     VOSK_AVAILABLE = True
@@ -42,12 +64,17 @@ class EnhancedAudioMonitor:
         self.format = pyaudio.paInt16
         
         # Audio processing
-        self.audio = pyaudio.PyAudio()
+        self.audio = get_pyaudio()
         self.stream = None
         self.is_monitoring = False
         
+        # Captured chunks, filled by the stream callback
+        self.audio_queue = queue.Queue(maxsize=32)
+        self.audio_ready = threading.Event()
+        
         # Speech recognition
         self.recognizer = None
+        self.whisper_model = None
         self.vosk_model = None
         self.vosk_recognizer = None
         
@@ -57,6 +84,18 @@ class EnhancedAudioMonitor:
         self.last_speech_time = 0
         self.speech_timeout = 2.0  # seconds
         
+        # Transcription runs off the capture path on a single worker
+        self.transcribe_executor = ThreadPoolExecutor(max_workers=1)
+        self.pending_transcriptions = deque()
+        self.max_pending_transcriptions = 4
+        
+        # Reused Whisper input buffer (Whisper pads its features to 30 seconds itself)
+        self.whisper_max_samples = self.sample_rate * 30
+        self._audio_buf = np.zeros(self.whisper_max_samples, dtype=np.float32)
+        
+        # Suspicious keyword matcher (rebuilt when keywords change)
+        self.keyword_matcher = KeywordMatcher(config.get('suspicious_keywords', []))
+        
         # Statistics
         self.audio_statistics = {
             'speech': 0,
@@ -92,6 +131,23 @@ class EnhancedAudioMonitor:
         """Initialize speech recognition components with multi-language support"""
         global VOSK_AVAILABLE, SPEECH_RECOGNITION_AVAILABLE
         
+        if FASTER_WHISPER_AVAILABLE:
+            # Local int8 Whisper model, no network round-trip per utterance
+            try:
+                self.whisper_model = WhisperModel(
+                    self.config.get('whisper_model', 'base'),
+                    device="cpu",
+                    compute_type="int8"
+                )
+                
+                # Warm up on a full 30 second window so the first utterance skips setup
+                segments, _ = self.whisper_model.transcribe(self._audio_buf, beam_size=1)
+                list(segments)
+                print("✓ faster-whisper model loaded")
+            except Exception as e:
+                print(f"Error loading faster-whisper model: {e}")
+        
+        # Load the fallbacks too, transcribe_speech uses them when Whisper fails at runtime
         if VOSK_AVAILABLE:
             # Try to load Vosk model
             model_path = Path(__file__).parent / 'models' / 'vosk-model-small-en-us'
@@ -218,6 +274,31 @@ class EnhancedAudioMonitor:
         if len(audio_data) == 0:
             return {'text': '', 'confidence': 0.0, 'language': 'unknown'}
         
+        # Try faster-whisper first (offline, multi-language)
+        if self.whisper_model is not None:
+            try:
+                # Scale into the preallocated buffer
+                num_samples = min(len(audio_data), self.whisper_max_samples)
+                np.multiply(audio_data[:num_samples], 1.0 / 32768.0,
+                            out=self._audio_buf[:num_samples], casting='unsafe')
+                
+                segments, info = self.whisper_model.transcribe(
+                    self._audio_buf[:num_samples],
+                    language=None if language == 'auto' else language,
+                    beam_size=1,
+                    vad_filter=True
+                )
+                text = "".join(segment.text for segment in segments).strip()
+                if text:
+                    return {
+                        'text': text,
+                        'confidence': info.language_probability,
+                        'language': info.language,
+                        'method': 'faster-whisper'
+                    }
+            except Exception as e:
+                print(f"faster-whisper transcription error: {e}")
+        
         # Convert audio data to the right format
         audio_bytes = audio_data.tobytes()
         
@@ -227,7 +308,7 @@ class EnhancedAudioMonitor:
                 self.vosk_recognizer.AcceptWaveform(audio_bytes)
                 result = self.vosk_recognizer.FinalResult()
                 if result:
-                    result_dict = json.loads(result)
+                    result_dict = json_loads(result)
                     if result_dict.get('text', '').strip():
                         return {
                             'text': result_dict['text'],
@@ -241,8 +322,8 @@ class EnhancedAudioMonitor:
         # Try Google Speech Recognition (online, multi-language)
         if SPEECH_RECOGNITION_AVAILABLE and self.recognizer:
             try:
-                # Create AudioData object
-                audio_data_sr = sr.AudioData(audio_bytes, self.sample_rate, 2)
+                # Create AudioData object with telephone-band 8 kHz audio (half the upload)
+                audio_data_sr = sr.AudioData(downsample_to_8k(audio_data), 8000, 2)
                 
                 # Try with specified language
                 if language != 'auto':
@@ -273,7 +354,7 @@ class EnhancedAudioMonitor:
                         'language': 'auto-detected',
                         'method': 'google'
                     }
-                    
+            
             except sr.UnknownValueError:
                 pass
             except sr.RequestError as e:
@@ -288,15 +369,9 @@ class EnhancedAudioMonitor:
         if not text:
             return {'detected': False, 'keywords': [], 'confidence': 0.0}
         
-        text_lower = text.lower()
-        suspicious_keywords = self.config.get('suspicious_keywords', [])
-        
-        detected_keywords = []
-        for keyword in suspicious_keywords:
-            if keyword.lower() in text_lower:
-                detected_keywords.append(keyword)
+        detected_keywords = self.keyword_matcher.find(text)
         
-        confidence = len(detected_keywords) / max(len(suspicious_keywords), 1)
+        confidence = len(detected_keywords) / max(len(self.keyword_matcher.keywords), 1)
         
         return {
             'detected': len(detected_keywords) > 0,
@@ -305,14 +380,26 @@ class EnhancedAudioMonitor:
             'text': text
         }
     
+    def audio_callback(self, in_data, frame_count, time_info, status):
+        """Callback for audio stream"""
+        if self.is_monitoring:
+            try:
+                self.audio_queue.put_nowait(in_data)
+            except queue.Full:
+                # Consumer is behind, drop this chunk
+                pass
+            self.audio_ready.set()
+        
+        return (None, pyaudio.paContinue)
+    
     def process_frame(self) -> Optional[Dict[str, Any]]:
         """Process a single audio frame"""
         if not self.is_monitoring or not self.stream:
             return None
         
         try:
-            # Read audio data
-            audio_data = self.stream.read(self.chunk_size, exception_on_overflow=False)
+            # Get captured audio data
+            audio_data = self.audio_queue.get_nowait()
             audio_array = np.frombuffer(audio_data, dtype=np.int16)
             
             # Detect audio type
@@ -345,41 +432,60 @@ class EnhancedAudioMonitor:
                         # Convert to numpy array
                         speech_array = np.array(self.speech_buffer, dtype=np.int16)
                         
-                        # Try multiple languages for transcription
-                        transcription_result = self.transcribe_speech(speech_array, 'auto')
+                        # Drop the oldest waiting job when the worker falls behind real time
+                        while len(self.pending_transcriptions) >= self.max_pending_transcriptions:
+                            self.pending_transcriptions.popleft().cancel()
                         
-                        if transcription_result['text']:
-                            # Detect suspicious keywords
-                            keyword_result = self.detect_suspicious_keywords(transcription_result['text'])
-                            
-                            result.update({
-                                'text': transcription_result['text'],
-                                'language': transcription_result['language'],
-                                'transcription_confidence': transcription_result['confidence'],
-                                'detected': keyword_result['detected'],
-                                'details': keyword_result
-                            })
-                            
-                            # Display the transcribed text clearly
-                            print("\n" + "="*50)
-                            print("🎯 SPEECH TRANSCRIBED!")
-                            print("="*50)
-                            print(f"📝 Text: \"{transcription_result['text']}\"")
-                            print(f"🌍 Language: {transcription_result['language']}")
-                            print(f"📊 Confidence: {transcription_result['confidence']:.2f}")
-                            if keyword_result['detected']:
-                                print(f"⚠️  SUSPICIOUS KEYWORDS: {keyword_result['keywords']}")
-                            print("="*50)
+                        # Transcribe on the worker thread; the result is attached to a later frame
+                        self.pending_transcriptions.append(
+                            self.transcribe_executor.submit(self.transcribe_speech, speech_array, 'auto')
+                        )
                         
                         # Clear speech buffer
                         self.speech_buffer = []
             
-            return result
+            # Attach any finished transcription to this frame's result
+            self.collect_transcription(result)
             
+            return result
+        
+        except queue.Empty:
+            # No audio data available
+            return None
         except Exception as e:
             print(f"Error processing audio frame: {e}")
             return None
     
+    def collect_transcription(self, result: Dict[str, Any]):
+        """Attach the oldest finished transcription to a frame result"""
+        if not self.pending_transcriptions or not self.pending_transcriptions[0].done():
+            return
+        
+        transcription_result = self.pending_transcriptions.popleft().result()
+        
+        if transcription_result['text']:
+            # Detect suspicious keywords
+            keyword_result = self.detect_suspicious_keywords(transcription_result['text'])
+            
+            result.update({
+                'text': transcription_result['text'],
+                'language': transcription_result['language'],
+                'transcription_confidence': transcription_result['confidence'],
+                'detected': keyword_result['detected'],
+                'details': keyword_result
+            })
+            
+            # Display the transcribed text clearly
+            print("\n" + "="*50)
+            print("🎯 SPEECH TRANSCRIBED!")
+            print("="*50)
+            print(f"📝 Text: \"{transcription_result['text']}\"")
+            print(f"🌍 Language: {transcription_result['language']}")
+            print(f"📊 Confidence: {transcription_result['confidence']:.2f}")
+            if keyword_result['detected']:
+                print(f"⚠️  SUSPICIOUS KEYWORDS: {keyword_result['keywords']}")
+            print("="*50)
+    
     def start(self):
         """Start audio monitoring"""
         if self.is_monitoring:
@@ -391,27 +497,28 @@ class EnhancedAudioMonitor:
                 channels=self.channels,
                 rate=self.sample_rate,
                 input=True,
-                frames_per_buffer=self.chunk_size
+                frames_per_buffer=self.chunk_size,
+                stream_callback=self.audio_callback
             )
             
             self.is_monitoring = True
+            self.stream.start_stream()
             print("✓ Audio stream started")
-            
+        
         except Exception as e:
             print(f"Error starting audio stream: {e}")
     
     def stop(self):
         """Stop audio monitoring"""
         self.is_monitoring = False
+        self.audio_ready.set()
+        self.pending_transcriptions.clear()
         
         if self.stream:
             self.stream.stop_stream()
             self.stream.close()
             self.stream = None
         
-        if self.audio:
-            self.audio.terminate()
-        
         print("Enhanced audio monitoring stopped")
     
     def get_status(self) -> Dict[str, Any]:
@@ -440,6 +547,7 @@ class EnhancedAudioMonitor:
     def update_keywords(self, keywords: List[str]):
         """Update suspicious keywords"""
         self.config['suspicious_keywords'] = keywords
+        self.keyword_matcher = KeywordMatcher(keywords)
         print(f"Updated suspicious keywords: {keywords}")
     
     def update_sensitivity(self, sensitivity: float):
@@ -466,16 +574,19 @@ def main():
         print("Enhanced audio monitoring started. Press Ctrl+C to stop.")
         
         while True:
-            result = monitor.process_frame()
-            if result and result.get('audio_type') == 'speech':
-                print(f"Audio Type: {result['audio_type']}")
-                if result.get('text'):
-                    print(f"Transcribed: {result['text']}")
-                    print(f"Language: {result.get('language', 'unknown')}")
-                print("---")
-            
-            time.sleep(0.1)
+            monitor.audio_ready.wait(timeout=1.0)
+            monitor.audio_ready.clear()
             
+            result = monitor.process_frame()
+            while result:
+                if result.get('audio_type') == 'speech':
+                    print(f"Audio Type: {result['audio_type']}")
+                    if result.get('text'):
+                        print(f"Transcribed: {result['text']}")
+                        print(f"Language: {result.get('language', 'unknown')}")
+                    print("---")
+                result = monitor.process_frame()
+    
     except KeyboardInterrupt:
         print("Stopping enhanced audio monitoring...")
         monitor.stop()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Keyword Matcher
+Finds suspicious keywords in transcribed text with a single pass over the text
+"""
+
+import re
+from typing import List
+
+try:
+    import hyperscan
+    HYPERSCAN_AVAILABLE = True
+except ImportError:
+    HYPERSCAN_AVAILABLE = False
+
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+    print("pyahocorasick not available, using substring keyword matching")
+
+# Maps ASCII A-Z to a-z for bytes.translate
+_ASCII_LOWER = bytes.maketrans(bytes(range(65, 91)), bytes(range(97, 123)))
+
+class KeywordMatcher:
+    def __init__(self, keywords: List[str]):
+        self.keywords = list(keywords)
+        self._keywords_lower = [(keyword.lower(), keyword) for keyword in self.keywords]
+        
+        # ASCII keywords can be matched on bytes without Unicode case folding
+        self._keywords_bytes = None
+        if all(keyword.isascii() for keyword in self.keywords):
+            self._keywords_bytes = [(keyword_lower.encode('ascii'), keyword)
+                                    for keyword_lower, keyword in self._keywords_lower]
+        
+        # Compile a Hyperscan block-mode database once per keyword list
+        self._hs = None
+        if HYPERSCAN_AVAILABLE and self.keywords:
+            self._hs = hyperscan.Database()
+            self._hs.compile(
+                expressions=[re.escape(keyword).encode() for keyword in self.keywords],
+                ids=list(range(len(self.keywords))),
+                flags=[hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SINGLEMATCH] * len(self.keywords)
+            )
+        
+        # Otherwise build the Aho-Corasick automaton once per keyword list
+        self._automaton = None
+        if self._hs is None and AHOCORASICK_AVAILABLE and self.keywords:
+            self._automaton = ahocorasick.Automaton()
+            for keyword_lower, keyword in self._keywords_lower:
+                self._automaton.add_word(keyword_lower, keyword)
+            self._automaton.make_automaton()
+    
+    def find(self, text: str) -> List[str]:
+        """Return the keywords contained in the text, each reported once"""
+        if not text or not self.keywords:
+            return []
+        
+        if self._hs is not None:
+            # Caseless matching on the raw bytes, each keyword reported once
+            hits = []
+            self._hs.scan(text.encode(), match_event_handler=lambda i, start, end, flags, context: hits.append(i))
+            return [self.keywords[i] for i in sorted(set(hits))]
+        
+        if self._automaton is not None:
+            return list(dict.fromkeys(keyword for _, keyword in self._automaton.iter(text.lower())))
+        
+        # Substring scan, on translated bytes when everything is ASCII
+        if self._keywords_bytes is not None and text.isascii():
+            text_bytes = text.encode('ascii').translate(_ASCII_LOWER)
+            return [keyword for keyword_bytes, keyword in self._keywords_bytes if keyword_bytes in text_bytes]
+        
+        text_lower = text.lower()
+        return [keyword for keyword_lower, keyword in self._keywords_lower if keyword_lower in text_lower]
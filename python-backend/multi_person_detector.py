@@ -10,8 +10,32 @@ import time
 import json
 from typing import Dict, List, Any, Optional
 import threading
+import queue
 from pathlib import Path
 
+from yolo_cache import get_yolo, get_yolo_lock
+from onnx_detector import ORT_AVAILABLE, INT8_MODEL_PATH, OnnxYOLO
+
+try:
+    import torch
+    TORCH_AVAILABLE = True
+except ImportError:
+    TORCH_AVAILABLE = False
+
+from numba_compat import njit
+
+@njit(cache=True)
+def _analyze_counts(counts, idx, filled, window, person_count, max_allowed, threshold):
+    """Average the most recent counts in the ring buffer and check alert conditions"""
+    size = counts.shape[0]
+    n = min(filled, window)
+    total = 0
+    for k in range(n):
+        total += counts[(idx - 1 - k) % size]
+    avg_count = total / n if n > 0 else 0.0
+    over_limit = person_count > max_allowed and person_count >= threshold
+    return avg_count, over_limit
+
 class MultiPersonDetector:
     def __init__(self, config: Dict[str, Any]):
         self.config = config
@@ -19,17 +43,50 @@ class MultiPersonDetector:
         self.alert_threshold = config.get('alert_threshold', 2)  # Alert when 2+ people detected
         self.detection_confidence = config.get('detection_confidence', 0.5)
         self.alert_cooldown = config.get('alert_cooldown', 10)  # seconds
+        self.inference_size = config.get('inference_size', 640)  # YOLO input size
+        self.motion_threshold = config.get('motion_threshold', 3.0)  # Mean gray-level change to re-detect
+        self.max_reuse_time = config.get('max_reuse_time', 1.0)  # seconds
+        
+        # Frame downscaling (computed from the first frame)
+        self._frame_shape = None
+        self._scale = 1.0
+        self._small_size = None
+        
+        # Last detection, reused while the scene is unchanged
+        self._prev_small = None
+        self._last_people = None
+        self._last_detection_time = 0
+        self.frames_processed = 0
+        self.frames_skipped = 0
         
         # Detection history
         self.last_alert_time = 0
-        self.person_count_history = []
         self.max_history_size = 30  # Keep last 30 detections
+        self.avg_window = 10  # Average over the last 10 detections
+        self._counts = np.zeros(self.max_history_size, dtype=np.int32)
+        self._idx = 0
+        self._filled = 0
         
         # Load YOLO model for person detection
         self.model = None
+        self.onnx_model = None
         self.classes = []
+        self.device = 'cpu'
+        self.use_half = False
+        self._person_cls_id = 0  # Person class in the COCO dataset
+        
+        # CUDA input path: pinned double buffer uploaded on a side stream
+        self._stream = None
+        self._pinned = [None, None]
+        self._pinned_src_shape = None
+        self._copy_done = [None, None]  # CUDA events marking when each buffer's copy finished
+        self._slot = 0
         self.initialize_model()
         
+        # HOG fallback detector (created on first use)
+        self._hog = None
+        self._use_opencl = False
+        
         print(f"Multi-Person Detector initialized")
         print(f"Max allowed people: {self.max_allowed_people}")
         print(f"Alert threshold: {self.alert_threshold} people")
@@ -43,10 +100,40 @@ class MultiPersonDetector:
                 print("⚠️  YOLO model not found, downloading...")
                 self.download_yolo_model()
             
-            from ultralytics import YOLO
-            self.model = YOLO('yolov8n.pt')
+            self.model = get_yolo('yolov8n.pt')
+            self.model_lock = get_yolo_lock('yolov8n.pt')
+            self._person_cls_id = next(
+                (i for i, name in self.model.names.items() if name == 'person'), 0)
             print("✅ YOLO model loaded successfully")
             
+            # Use FP16 inference on CUDA GPUs, on a separately cached instance so
+            # the CPU model other modules share keeps its device and precision
+            try:
+                if TORCH_AVAILABLE and torch.cuda.is_available():
+                    self.model = get_yolo('yolov8n.pt', device=0, half=True)
+                    self.model_lock = get_yolo_lock('yolov8n.pt', device=0, half=True)
+                    self.device = 0
+                    self.use_half = True
+                    self._stream = torch.cuda.Stream()
+                    print("✅ YOLO running on GPU (FP16)")
+            except Exception as e:
+                print(f"⚠️  GPU setup failed, using FP32 on CPU: {e}")
+                self.model = get_yolo('yolov8n.pt')
+                self.model_lock = get_yolo_lock('yolov8n.pt')
+                self.device = 'cpu'
+                self.use_half = False
+                self._stream = None
+            
+            # On CPU prefer the INT8 ONNX export (see onnx_detector.py) when it has been generated
+            if self.device == 'cpu' and ORT_AVAILABLE and INT8_MODEL_PATH.exists():
+                try:
+                    self.onnx_model = OnnxYOLO(INT8_MODEL_PATH, conf_threshold=self.detection_confidence,
+                                               input_size=self.inference_size)
+                    print("✅ Person detection using the INT8 ONNX model")
+                except Exception as e:
+                    print(f"⚠️  INT8 ONNX model failed to load, using PyTorch: {e}")
+                    self.onnx_model = None
+            
         except Exception as e:
             print(f"❌ Error loading YOLO model: {e}")
             print("⚠️  Using OpenCV HOG detector as fallback")
@@ -55,36 +142,143 @@ class MultiPersonDetector:
     def download_yolo_model(self):
         """Download YOLO model if not available"""
         try:
-            from ultralytics import YOLO
-            model = YOLO('yolov8n.pt')
+            get_yolo('yolov8n.pt')
             print("✅ YOLO model downloaded successfully")
         except Exception as e:
             print(f"❌ Error downloading YOLO model: {e}")
     
+    def update_scale(self, frame: np.ndarray):
+        """Compute the downscale factor for the YOLO input size"""
+        h, w = frame.shape[:2]
+        self._frame_shape = frame.shape[:2]
+        self._scale = min(1.0, self.inference_size / max(h, w))
+        self._small_size = (int(w * self._scale), int(h * self._scale))
+    
+    def prepare_cuda_input(self, frame: np.ndarray):
+        """Resize the frame into a pinned buffer and upload it on the side stream without blocking"""
+        h, w = frame.shape[:2]
+        if self._pinned_src_shape != (h, w):
+            # Tensor inputs skip letterboxing, so round each side to the 32 px stride
+            in_w = max(32, int(round(w * self._scale / 32)) * 32)
+            in_h = max(32, int(round(h * self._scale / 32)) * 32)
+            self._pinned = [torch.empty((in_h, in_w, 3), dtype=torch.uint8, pin_memory=True)
+                            for _ in range(2)]
+            self._copy_done = [None, None]
+            self._pinned_src_shape = (h, w)
+        
+        # Alternate buffers so this frame is resized while the previous one is still copying
+        slot = self._slot
+        self._slot ^= 1
+        pinned = self._pinned[slot]
+        if self._copy_done[slot] is not None:
+            self._copy_done[slot].synchronize()
+        
+        in_h, in_w = pinned.shape[:2]
+        cv2.resize(frame, (in_w, in_h), dst=pinned.numpy(), interpolation=cv2.INTER_AREA)
+        
+        with torch.cuda.stream(self._stream):
+            x = pinned.to('cuda', non_blocking=True)
+            copy_done = torch.cuda.Event()
+            copy_done.record(self._stream)
+            self._copy_done[slot] = copy_done
+        
+        # Inference waits for the copy on the GPU, the host does not block here
+        compute = torch.cuda.current_stream()
+        compute.wait_stream(self._stream)
+        x.record_stream(compute)
+        x = x.permute(2, 0, 1).flip(0).unsqueeze(0)  # HWC BGR -> BCHW RGB
+        x = (x.half() if self.use_half else x.float()).div_(255.0)
+        
+        box_scale = np.array([w / in_w, h / in_h, w / in_w, h / in_h], dtype=np.float32)
+        return x, box_scale
+    
+    def run_yolo(self, frame: np.ndarray):
+        """Run YOLO on the frame, returning the results and the box scale back to the frame"""
+        if self._stream is not None:
+            x, box_scale = self.prepare_cuda_input(frame)
+            # The host syncs only when detect_people copies the boxes back;
+            # tensor inputs are used at their own size, so no imgsz is passed
+            with self.model_lock:
+                results = self.model(x, conf=self.detection_confidence,
+                                     half=self.use_half, device=self.device, verbose=False)
+            return results, box_scale
+        
+        if self._scale < 1.0:
+            small = cv2.resize(frame, self._small_size, interpolation=cv2.INTER_AREA)
+        else:
+            small = frame
+        
+        with self.model_lock:
+            results = self.model(small, imgsz=self.inference_size, conf=self.detection_confidence,
+                                 half=self.use_half, device=self.device, verbose=False)
+        return results, 1.0 / self._scale
+    
+    def detect_people_onnx(self, frame: np.ndarray) -> List[Dict[str, Any]]:
+        """Detect people using the INT8 ONNX Runtime model"""
+        try:
+            people = []
+            for det in self.onnx_model.detect(frame):
+                if det['class_id'] != self._person_cls_id:
+                    continue
+                
+                x1, y1, x2, y2 = det['bbox']
+                people.append({
+                    'bbox': [int(x1), int(y1), int(x2), int(y2)],
+                    'confidence': det['confidence'],
+                    'center': [int((x1 + x2) / 2), int((y1 + y2) / 2)]
+                })
+            
+            return people
+            
+        except Exception as e:
+            print(f"Error in ONNX detection: {e}")
+            return []
+    
     def detect_people_yolo(self, frame: np.ndarray) -> List[Dict[str, Any]]:
         """Detect people using YOLO model"""
         if self.model is None:
             return []
         
+        if self.onnx_model is not None:
+            return self.detect_people_onnx(frame)
+        
         try:
+            # Recompute the model input size when the frame size changes
+            if self._frame_shape != frame.shape[:2]:
+                self.update_scale(frame)
+            
             # Run YOLO detection
-            results = self.model(frame, verbose=False)
+            try:
+                results, box_scale = self.run_yolo(frame)
+            except Exception as e:
+                if not self.use_half:
+                    raise
+                # Some GPUs do not support FP16 inference, fall back to FP32
+                print(f"⚠️  FP16 inference failed, falling back to FP32: {e}")
+                self.use_half = False
+                # Switch to the cached FP32 instance rather than converting the shared FP16 one
+                self.model = get_yolo('yolov8n.pt', device=self.device, half=False)
+                self.model_lock = get_yolo_lock('yolov8n.pt', device=self.device, half=False)
+                results, box_scale = self.run_yolo(frame)
             
             people = []
             for result in results:
                 boxes = result.boxes
-                if boxes is not None:
-                    for box in boxes:
-                        # Check if detected object is a person (class 0 in COCO dataset)
-                        if int(box.cls[0]) == 0:  # Person class
-                            confidence = float(box.conf[0])
-                            if confidence > self.detection_confidence:
-                                x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                                people.append({
-                                    'bbox': [int(x1), int(y1), int(x2), int(y2)],
-                                    'confidence': confidence,
-                                    'center': [int((x1 + x2) / 2), int((y1 + y2) / 2)]
-                                })
+                if boxes is None or len(boxes) == 0:
+                    continue
+                
+                # Copy all boxes to host once and filter with a single mask
+                cls = boxes.cls.cpu().numpy()
+                conf = boxes.conf.cpu().numpy()
+                xyxy = boxes.xyxy.cpu().numpy() * box_scale
+                mask = (cls == self._person_cls_id) & (conf > self.detection_confidence)
+                
+                for (x1, y1, x2, y2), confidence in zip(xyxy[mask].tolist(), conf[mask].tolist()):
+                    people.append({
+                        'bbox': [int(x1), int(y1), int(x2), int(y2)],
+                        'confidence': confidence,
+                        'center': [int((x1 + x2) / 2), int((y1 + y2) / 2)]
+                    })
             
             return people
             
@@ -95,15 +289,24 @@ class MultiPersonDetector:
     def detect_people_hog(self, frame: np.ndarray) -> List[Dict[str, Any]]:
         """Detect people using OpenCV HOG detector (fallback)"""
         try:
+            # Initialize HOG detector once
+            if self._hog is None:
+                self._hog = cv2.HOGDescriptor()
+                self._hog.setSVMDetector(cv2.HOGDescriptor_getDefaultPeopleDetector())
+                self._use_opencl = cv2.ocl.haveOpenCL()
+                if self._use_opencl:
+                    cv2.ocl.setUseOpenCL(True)
+                    print("✅ HOG detector using OpenCL")
+            
             # Convert to grayscale
             gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
             
-            # Initialize HOG detector
-            hog = cv2.HOGDescriptor()
-            hog.setSVMDetector(cv2.HOGDescriptor_getDefaultPeopleDetector())
+            # Let OpenCV dispatch to the OpenCL kernels when available
+            if self._use_opencl:
+                gray = cv2.UMat(gray)
             
             # Detect people
-            boxes, weights = hog.detectMultiScale(
+            boxes, weights = self._hog.detectMultiScale(
                 gray, 
                 winStride=(8, 8),
                 padding=(4, 4),
@@ -141,38 +344,31 @@ class MultiPersonDetector:
         person_count = len(people)
         current_time = time.time()
         
-        # Add to history
-        self.person_count_history.append({
-            'count': person_count,
-            'timestamp': current_time,
-            'people': people
-        })
-        
-        # Keep only recent history
-        if len(self.person_count_history) > self.max_history_size:
-            self.person_count_history.pop(0)
+        # Add to history (ring buffer of recent counts)
+        self._counts[self._idx] = person_count
+        self._idx = (self._idx + 1) % self.max_history_size
+        self._filled = min(self._filled + 1, self.max_history_size)
         
         # Calculate average person count over recent detections
-        recent_counts = [entry['count'] for entry in self.person_count_history[-10:]]
-        avg_count = sum(recent_counts) / len(recent_counts) if recent_counts else 0
+        avg_count, over_limit = _analyze_counts(
+            self._counts, self._idx, self._filled, self.avg_window,
+            person_count, self.max_allowed_people, self.alert_threshold)
         
         # Determine alert status
         is_alert = False
         alert_type = None
         alert_message = ""
         
-        if person_count > self.max_allowed_people:
-            if person_count >= self.alert_threshold:
-                # Check cooldown to avoid spam alerts
-                if current_time - self.last_alert_time > self.alert_cooldown:
-                    is_alert = True
-                    alert_type = "multiple_people"
-                    alert_message = f"🚨 SECURITY ALERT: {person_count} people detected! Maximum allowed: {self.max_allowed_people}"
-                    self.last_alert_time = current_time
+        # Check cooldown to avoid spam alerts
+        if over_limit and current_time - self.last_alert_time > self.alert_cooldown:
+            is_alert = True
+            alert_type = "multiple_people"
+            alert_message = f"🚨 SECURITY ALERT: {person_count} people detected! Maximum allowed: {self.max_allowed_people}"
+            self.last_alert_time = current_time
         
         return {
             'person_count': person_count,
-            'avg_count': avg_count,
+            'avg_count': float(avg_count),
             'is_alert': is_alert,
             'alert_type': alert_type,
             'alert_message': alert_message,
@@ -180,26 +376,31 @@ class MultiPersonDetector:
             'timestamp': current_time
         }
     
-    def draw_detections(self, frame: np.ndarray, people: List[Dict[str, Any]], analysis: Dict[str, Any]) -> np.ndarray:
-        """Draw detection boxes and information on frame"""
-        frame_copy = frame.copy()
+    def draw_detections(self, frame: np.ndarray, people: List[Dict[str, Any]], analysis: Dict[str, Any],
+                        copy: bool = True) -> np.ndarray:
+        """Draw detection boxes and information on frame
+        
+        With copy=False the boxes are drawn directly onto the given frame,
+        which saves a full-frame copy when the caller discards it afterwards.
+        """
+        frame_copy = frame.copy() if copy else frame
+        
+        # Color based on alert status
+        if analysis['is_alert']:
+            color = (0, 0, 255)  # Red for alert
+        else:
+            color = (0, 255, 0)  # Green for normal
+        
+        labels = [f"Person {i+1}: {person['confidence']:.2f}" for i, person in enumerate(people)]
         
         # Draw person detection boxes
-        for i, person in enumerate(people):
+        for person, label in zip(people, labels):
             bbox = person['bbox']
-            confidence = person['confidence']
-            
-            # Color based on alert status
-            if analysis['is_alert']:
-                color = (0, 0, 255)  # Red for alert
-            else:
-                color = (0, 255, 0)  # Green for normal
             
             # Draw bounding box
             cv2.rectangle(frame_copy, (bbox[0], bbox[1]), (bbox[2], bbox[3]), color, 2)
             
             # Draw person label
-            label = f"Person {i+1}: {confidence:.2f}"
             cv2.putText(frame_copy, label, (bbox[0], bbox[1] - 10), 
                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
         
@@ -235,8 +436,25 @@ class MultiPersonDetector:
     
     def process_frame(self, frame: np.ndarray) -> Dict[str, Any]:
         """Process a single frame for multi-person detection"""
-        # Detect people
-        people = self.detect_people(frame)
+        # Skip detection when the frame barely differs from the last detected one
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        small = cv2.resize(gray, (64, 64), interpolation=cv2.INTER_AREA)
+        self.frames_processed += 1
+        if self._prev_small is not None:
+            change = cv2.norm(small, self._prev_small, cv2.NORM_L1) / small.size
+        else:
+            change = float('inf')
+        scene_changed = change >= self.motion_threshold
+        
+        if not scene_changed and time.time() - self._last_detection_time < self.max_reuse_time:
+            people = self._last_people
+            self.frames_skipped += 1
+        else:
+            # Detect people
+            people = self.detect_people(frame)
+            self._prev_small = small
+            self._last_people = people
+            self._last_detection_time = time.time()
         
         # Analyze person count
         analysis = self.analyze_person_count(people)
@@ -251,7 +469,8 @@ class MultiPersonDetector:
             'alert_message': analysis['alert_message'],
             'people': people,
             'max_allowed': self.max_allowed_people,
-            'alert_threshold': self.alert_threshold
+            'alert_threshold': self.alert_threshold,
+            'scene_changed': scene_changed
         }
         
         return result
@@ -263,8 +482,10 @@ class MultiPersonDetector:
             'alert_threshold': self.alert_threshold,
             'detection_confidence': self.detection_confidence,
             'alert_cooldown': self.alert_cooldown,
+            'motion_threshold': self.motion_threshold,
             'last_alert_time': self.last_alert_time,
-            'history_size': len(self.person_count_history)
+            'history_size': self._filled,
+            'skip_ratio': self.frames_skipped / self.frames_processed if self.frames_processed else 0.0
         }
     
     def update_config(self, config: Dict[str, Any]):
@@ -273,8 +494,28 @@ class MultiPersonDetector:
         self.alert_threshold = config.get('alert_threshold', self.alert_threshold)
         self.detection_confidence = config.get('detection_confidence', self.detection_confidence)
         self.alert_cooldown = config.get('alert_cooldown', self.alert_cooldown)
+        self.motion_threshold = config.get('motion_threshold', self.motion_threshold)
+        self.max_reuse_time = config.get('max_reuse_time', self.max_reuse_time)
+        if self.onnx_model is not None:
+            self.onnx_model.conf_threshold = self.detection_confidence
         print(f"✅ Multi-person detector configuration updated")
 
+def _reader_thread(cap: cv2.VideoCapture, read_q: queue.Queue, stop_event: threading.Event):
+    """Read webcam frames into a bounded queue so capture overlaps detection"""
+    while not stop_event.is_set():
+        ret, frame = cap.read()
+        if not ret:
+            frame = None  # Signals a read failure to the consumer
+        
+        try:
+            read_q.put(frame, timeout=1.0)
+        except queue.Full:
+            # Consumer is behind, drop this frame
+            pass
+        
+        if frame is None:
+            break
+
 def main():
     """Test the multi-person detector"""
     config = {
@@ -297,10 +538,20 @@ def main():
     print("Press 'q' to quit")
     print("=" * 50)
     
+    # Capture frames on a separate thread
+    read_q = queue.Queue(maxsize=2)
+    stop_event = threading.Event()
+    reader = threading.Thread(target=_reader_thread, args=(cap, read_q, stop_event), daemon=True)
+    reader.start()
+    
     try:
         while True:
-            ret, frame = cap.read()
-            if not ret:
+            try:
+                frame = read_q.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            
+            if frame is None:
                 print("❌ Cannot read frame")
                 break
             
@@ -308,7 +559,7 @@ def main():
             result = detector.process_frame(frame)
             
             # Draw detections
-            frame_with_info = detector.draw_detections(frame, result['people'], result)
+            frame_with_info = detector.draw_detections(frame, result['people'], result, copy=False)
             
             # Display result
             if result['is_alert']:
@@ -327,6 +578,8 @@ def main():
     except KeyboardInterrupt:
         print("\n🛑 Stopping multi-person detection...")
     finally:
+        stop_event.set()
+        reader.join(timeout=2)
         cap.release()
         cv2.destroyAllWindows()
         print("✅ Multi-person detection stopped")
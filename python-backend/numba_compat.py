@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+"""
+Numba Compatibility
+Optional Numba import shared by the modules that JIT-compile hot loops
+"""
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+    print("Numba not available")
+    
+    def njit(*args, **kwargs):
+        """Run the function as plain Python when Numba is missing"""
+        return lambda func: func
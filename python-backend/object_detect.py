@@ -38,6 +38,9 @@ import io
 from PIL import Image
 import uvicorn
 
+from yolo_cache import get_yolo, get_yolo_lock
+from onnx_detector import ORT_AVAILABLE, INT8_MODEL_PATH, OnnxYOLO
+
 app = FastAPI()
 
 # Allow CORS for local Electron app
@@ -50,7 +53,17 @@ app.add_middleware(
 )
 
 # Load YOLOv8 model (coco)
-model = YOLO("yolov8n.pt")  # Use yolov8n for speed, yolov8s/yolov8m for more accuracy
+# Prefer the INT8 ONNX export (see onnx_detector.py) when it has been generated
+onnx_model = None
+model = None
+model_lock = get_yolo_lock("yolov8n.pt")
+if ORT_AVAILABLE and INT8_MODEL_PATH.exists():
+    try:
+        onnx_model = OnnxYOLO(INT8_MODEL_PATH)
+    except Exception as e:
+        print(f"⚠️  INT8 ONNX model failed to load, using PyTorch: {e}")
+if onnx_model is None:
+    model = get_yolo("yolov8n.pt")  # Use yolov8n for speed, yolov8s/yolov8m for more accuracy
 
 # Define harmful objects (expand as needed)
 HARMFUL_OBJECTS = [
@@ -77,8 +90,25 @@ async def detect_objects(req: DetectionRequest):
     image = Image.open(io.BytesIO(image_data)).convert("RGB")
     frame = np.array(image)
     
-    # Run YOLOv8 detection
-    results = model(frame)
+    # Run INT8 ONNX detection (PIL gives RGB frames)
+    if onnx_model is not None:
+        detections = []
+        for det in onnx_model.detect(frame, bgr=False):
+            label = onnx_model.names.get(det['class_id'], str(det['class_id']))
+            is_harmful = any(h in label.lower() for h in HARMFUL_OBJECTS)
+            reason = "Harmful object detected" if is_harmful else "Safe object"
+            detections.append(DetectionBox(
+                label=label,
+                confidence=det['confidence'],
+                bbox=det['bbox'],
+                harmful=is_harmful,
+                reason=reason
+            ))
+        return DetectionResponse(detections=detections)
+    
+    # Run YOLOv8 detection, the cached model is shared with other modules
+    with model_lock:
+        results = model(frame, imgsz=640, conf=0.25, half=False, device='cpu', verbose=False)
     detections = []
     for r in results:
         for box in r.boxes:
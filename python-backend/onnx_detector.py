@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+ONNX Runtime YOLO Detector
+Runs an INT8-quantized YOLOv8 ONNX export on CPU and decodes boxes like Ultralytics
+"""
+
+import ast
+import cv2
+import numpy as np
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Tuple
+
+try:
+    import onnxruntime as ort
+    ORT_AVAILABLE = True
+except ImportError:
+    ORT_AVAILABLE = False
+    print("ONNX Runtime not available")
+
+INT8_MODEL_PATH = Path(__file__).parent / 'yolov8n_int8.onnx'
+
+def letterbox(frame: np.ndarray, size: int = 640) -> Tuple[np.ndarray, float, Tuple[int, int]]:
+    """Resize keeping aspect ratio and pad to a square of the given size"""
+    h, w = frame.shape[:2]
+    scale = min(size / h, size / w)
+    new_w, new_h = int(round(w * scale)), int(round(h * scale))
+    pad_x, pad_y = (size - new_w) // 2, (size - new_h) // 2
+    
+    resized = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    padded = cv2.copyMakeBorder(resized, pad_y, size - new_h - pad_y, pad_x, size - new_w - pad_x,
+                                cv2.BORDER_CONSTANT, value=(114, 114, 114))
+    return padded, scale, (pad_x, pad_y)
+
+def preprocess(frame: np.ndarray, size: int = 640, bgr: bool = True) -> Tuple[np.ndarray, float, Tuple[int, int]]:
+    """Convert a frame to the NCHW float32 RGB tensor expected by YOLOv8"""
+    padded, scale, pad = letterbox(frame, size)
+    if bgr:
+        padded = cv2.cvtColor(padded, cv2.COLOR_BGR2RGB)
+    tensor = padded.transpose(2, 0, 1)[np.newaxis].astype(np.float32) / 255.0
+    return np.ascontiguousarray(tensor), scale, pad
+
+class OnnxYOLO:
+    def __init__(self, model_path: Path = INT8_MODEL_PATH, conf_threshold: float = 0.25,
+                 iou_threshold: float = 0.45, input_size: Optional[int] = None):
+        self.conf_threshold = conf_threshold
+        self.iou_threshold = iou_threshold
+        
+        # CPU session with all graph optimizations (uses VNNI kernels for INT8 when available)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(str(model_path), sess_options=options,
+                                            providers=['CPUExecutionProvider'])
+        
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        
+        # Dynamic-shape exports accept any size; fixed exports only their own
+        model_size = model_input.shape[2] if isinstance(model_input.shape[2], int) else None
+        if model_size is None:
+            self.input_size = input_size or 640
+        else:
+            if input_size and input_size != model_size:
+                print(f"⚠️  ONNX model has a fixed {model_size}px input, ignoring input size {input_size}")
+            self.input_size = model_size
+        
+        # Ultralytics stores class names in the model metadata
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self.names = ast.literal_eval(metadata['names']) if 'names' in metadata else {}
+        
+        print(f"✅ ONNX model loaded: {Path(model_path).name}")
+    
+    def detect(self, frame: np.ndarray, bgr: bool = True) -> List[Dict[str, Any]]:
+        """Detect objects and return boxes in original frame coordinates"""
+        tensor, scale, (pad_x, pad_y) = preprocess(frame, self.input_size, bgr)
+        output = self.session.run(None, {self.input_name: tensor})[0]
+        
+        # Output layout is (1, 4 + num_classes, num_anchors) with cx, cy, w, h boxes
+        pred = output[0].T
+        scores = pred[:, 4:]
+        class_ids = scores.argmax(axis=1)
+        confidences = scores[np.arange(len(scores)), class_ids]
+        
+        keep = confidences > self.conf_threshold
+        if not np.any(keep):
+            return []
+        pred, class_ids, confidences = pred[keep], class_ids[keep], confidences[keep]
+        
+        # Per-class non-maximum suppression on top-left/width/height boxes
+        boxes = pred[:, :4].copy()
+        boxes[:, 0] -= boxes[:, 2] / 2
+        boxes[:, 1] -= boxes[:, 3] / 2
+        indices = cv2.dnn.NMSBoxesBatched(boxes.tolist(), confidences.tolist(), class_ids.tolist(),
+                                          self.conf_threshold, self.iou_threshold)
+        
+        h, w = frame.shape[:2]
+        detections = []
+        for i in np.array(indices).flatten():
+            x, y, bw, bh = boxes[i]
+            x1 = float(np.clip((x - pad_x) / scale, 0, w))
+            y1 = float(np.clip((y - pad_y) / scale, 0, h))
+            x2 = float(np.clip((x + bw - pad_x) / scale, 0, w))
+            y2 = float(np.clip((y + bh - pad_y) / scale, 0, h))
+            detections.append({
+                'bbox': [x1, y1, x2, y2],
+                'confidence': float(confidences[i]),
+                'class_id': int(class_ids[i])
+            })
+        
+        return detections
+
+def box_iou(a: List[float], b: List[float]) -> float:
+    """Intersection over union of two x1, y1, x2, y2 boxes"""
+    iw = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    ih = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = iw * ih
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+def validate_int8_model(fp32_path: Path, int8_path: Path, frames: List[np.ndarray],
+                        min_recall: float = 0.8) -> bool:
+    """Check that the INT8 model finds the detections of the FP32 model"""
+    fp32_model = OnnxYOLO(fp32_path)
+    int8_model = OnnxYOLO(int8_path)
+    
+    expected = 0
+    matched = 0
+    for frame in frames[:50]:
+        reference = fp32_model.detect(frame)
+        candidates = int8_model.detect(frame)
+        expected += len(reference)
+        matched += sum(
+            1 for ref in reference
+            if any(det['class_id'] == ref['class_id'] and box_iou(det['bbox'], ref['bbox']) >= 0.5
+                   for det in candidates)
+        )
+    
+    if expected == 0:
+        print("❌ FP32 model found nothing in the calibration frames, cannot validate INT8 accuracy")
+        return False
+    
+    recall = matched / expected
+    print(f"INT8 recall against FP32: {recall:.2f} ({matched}/{expected} detections)")
+    return recall >= min_recall
+
+def capture_calibration_frames(num_frames: int = 200, camera_index: int = 0) -> List[np.ndarray]:
+    """Capture webcam frames used to calibrate INT8 quantization"""
+    cap = cv2.VideoCapture(camera_index)
+    frames = []
+    try:
+        while len(frames) < num_frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(frame)
+    finally:
+        cap.release()
+    return frames
+
+def export_int8_model(num_frames: int = 200, output_path: Path = INT8_MODEL_PATH) -> bool:
+    """Export yolov8n to ONNX and quantize it to INT8 with webcam calibration"""
+    try:
+        import onnx
+        from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+        from ultralytics import YOLO
+    except ImportError as e:
+        print(f"❌ Missing export dependency: {e}")
+        return False
+    
+    # One-time FP32 export
+    fp32_path = YOLO('yolov8n.pt').export(format='onnx', imgsz=640, dynamic=True)
+    fp32_model = onnx.load(fp32_path)
+    input_name = fp32_model.graph.input[0].name
+    
+    frames = capture_calibration_frames(num_frames)
+    if not frames:
+        print("❌ Cannot capture calibration frames")
+        return False
+    print(f"Captured {len(frames)} calibration frames")
+    
+    class WebcamCalibrationReader(CalibrationDataReader):
+        def __init__(self):
+            self.tensors = (preprocess(frame)[0] for frame in frames)
+        
+        def get_next(self):
+            tensor = next(self.tensors, None)
+            return None if tensor is None else {input_name: tensor}
+    
+    # The detect head concatenates pixel boxes (0-640) with 0-1 class scores;
+    # a shared uint8 scale would round every score to zero, so keep it in FP32
+    head_nodes = [node.name for node in fp32_model.graph.node if node.name.startswith('/model.22/')]
+    
+    # Static quantization of the backbone convolutions: uint8 activations with int8 weights (VNNI friendly)
+    candidate_path = output_path.with_name(output_path.stem + '.candidate.onnx')
+    quantize_static(
+        fp32_path,
+        str(candidate_path),
+        WebcamCalibrationReader(),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        op_types_to_quantize=['Conv'],
+        nodes_to_exclude=head_nodes
+    )
+    
+    # Keep the class names from the original export
+    int8_model = onnx.load(str(candidate_path))
+    existing = {prop.key for prop in int8_model.metadata_props}
+    for prop in fp32_model.metadata_props:
+        if prop.key not in existing:
+            int8_model.metadata_props.add(key=prop.key, value=prop.value)
+    onnx.save(int8_model, str(candidate_path))
+    
+    # Only install the INT8 model if it still finds what the FP32 model finds
+    if not validate_int8_model(Path(fp32_path), candidate_path, frames):
+        candidate_path.unlink()
+        print("❌ INT8 model failed validation, keeping the PyTorch model")
+        return False
+    
+    candidate_path.replace(output_path)
+    print(f"✅ INT8 model saved to {output_path}")
+    return True
+
+def main():
+    """Export the INT8 ONNX model used by the detection API"""
+    print("📦 Exporting INT8 ONNX model")
+    print("=" * 50)
+    export_int8_model()
+
+if __name__ == "__main__":
+    main()
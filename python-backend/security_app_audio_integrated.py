@@ -7,21 +7,30 @@ Combines object detection, enhanced audio monitoring, and real-time alerts
 import cv2
 import numpy as np
 import time
-import json
+import asyncio
 import threading
-import queue
+import logging
 from pathlib import Path
 from typing import Dict, Any, Optional, List
 import uvicorn
-from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-import base64
+
+try:
+    import uvloop
+    UVLOOP_AVAILABLE = True
+except ImportError:
+    UVLOOP_AVAILABLE = False  # Not available on Windows
 
 # Import our modules
+from security_app_base import SecurityAppBase, setup_logging
 from enhanced_audio_monitor import EnhancedAudioMonitor
 
-class IntegratedSecurityApp:
+logger = logging.getLogger(__name__)
+
+class IntegratedSecurityApp(SecurityAppBase):
     def __init__(self):
+        super().__init__()
         self.app = FastAPI(title="Security Monitor API with Audio", version="2.0.0")
         self.setup_routes()
         self.setup_cors()
@@ -32,10 +41,7 @@ class IntegratedSecurityApp:
         
         # Threading
         self.monitoring_thread = None
-        self.incident_queue = queue.Queue()
-        
-        # WebSocket connections
-        self.active_connections: List[WebSocket] = []
+        self.audio_ready = threading.Event()
         
         # Initialize modules
         self.initialize_modules()
@@ -55,18 +61,12 @@ class IntegratedSecurityApp:
     def setup_routes(self):
         """Setup API routes"""
         
+        self.setup_common_routes()
+        
         @self.app.get("/")
         async def root():
             return {"message": "Security Monitor API with Audio Recognition", "status": "running"}
         
-        @self.app.get("/status")
-        async def get_status():
-            return {
-                "monitoring": self.is_monitoring,
-                "audio_monitor": self.audio_monitor.get_status() if self.audio_monitor else None,
-                "audio_statistics": self.audio_monitor.get_audio_statistics() if self.audio_monitor else None
-            }
-        
         @self.app.post("/start_monitoring")
         async def start_monitoring():
             if not self.is_monitoring:
@@ -77,7 +77,8 @@ class IntegratedSecurityApp:
         @self.app.post("/stop_monitoring")
         async def stop_monitoring():
             if self.is_monitoring:
-                self.stop_monitoring()
+                # Joining the monitoring threads blocks, keep it off the server loop
+                await asyncio.get_running_loop().run_in_executor(None, self.stop_monitoring)
                 return {"message": "Monitoring stopped", "status": "success"}
             return {"message": "Monitoring not active", "status": "info"}
         
@@ -87,6 +88,7 @@ class IntegratedSecurityApp:
             keywords = data.get('keywords', [])
             if self.audio_monitor:
                 self.audio_monitor.update_keywords(keywords)
+                self.invalidate_status()
                 return {"message": "Audio keywords updated", "keywords": keywords}
             return {"message": "Audio monitor not available", "status": "error"}
         
@@ -96,6 +98,7 @@ class IntegratedSecurityApp:
             sensitivity = data.get('sensitivity', 0.7)
             if self.audio_monitor:
                 self.audio_monitor.update_sensitivity(sensitivity)
+                self.invalidate_status()
                 return {"message": "Audio sensitivity updated", "sensitivity": sensitivity}
             return {"message": "Audio monitor not available", "status": "error"}
         
@@ -107,17 +110,14 @@ class IntegratedSecurityApp:
                     "status": "success"
                 }
             return {"message": "Audio monitor not available", "status": "error"}
-        
-        @self.app.websocket("/ws")
-        async def websocket_endpoint(websocket: WebSocket):
-            await websocket.accept()
-            self.active_connections.append(websocket)
-            try:
-                while True:
-                    # Keep connection alive
-                    await websocket.receive_text()
-            except WebSocketDisconnect:
-                self.active_connections.remove(websocket)
+    
+    def get_status_data(self) -> Dict[str, Any]:
+        """Return the /status payload"""
+        return {
+            "monitoring": self.is_monitoring,
+            "audio_monitor": self.audio_monitor.get_status() if self.audio_monitor else None,
+            "audio_statistics": self.audio_monitor.get_audio_statistics() if self.audio_monitor else None
+        }
     
     def initialize_modules(self):
         """Initialize enhanced audio monitoring module"""
@@ -133,6 +133,7 @@ class IntegratedSecurityApp:
                 ]
             }
             self.audio_monitor = EnhancedAudioMonitor(audio_config)
+            self.audio_monitor.audio_ready = self.audio_ready
             print("✓ Enhanced audio monitor initialized")
             
         except Exception as e:
@@ -144,6 +145,7 @@ class IntegratedSecurityApp:
             return
         
         self.is_monitoring = True
+        self.invalidate_status()
         
         # Start enhanced audio monitoring
         if self.audio_monitor:
@@ -161,6 +163,7 @@ class IntegratedSecurityApp:
             return
         
         self.is_monitoring = False
+        self.invalidate_status()
         
         # Stop audio monitoring
         if self.audio_monitor:
@@ -176,16 +179,22 @@ class IntegratedSecurityApp:
         """Main monitoring loop"""
         while self.is_monitoring:
             try:
-                # Process enhanced audio monitoring
-                audio_result = None
-                if self.audio_monitor:
-                    audio_result = self.audio_monitor.process_frame()
+                if not self.audio_monitor:
+                    time.sleep(1)
+                    continue
                 
-                # Handle results
-                if audio_result:
-                    self.handle_audio_incident(audio_result)
+                # Wait until the audio monitor has captured a chunk
+                if not self.audio_ready.wait(timeout=1.0):
+                    continue
+                self.audio_ready.clear()
                 
-                time.sleep(0.1)  # 10 FPS
+                # Process all pending audio chunks
+                audio_result = self.audio_monitor.process_frame()
+                while audio_result:
+                    # Every chunk yields a result, only recognized speech is an incident
+                    if audio_result.get('detected') or audio_result.get('text'):
+                        self.handle_audio_incident(audio_result)
+                    audio_result = self.audio_monitor.process_frame()
                 
             except Exception as e:
                 print(f"Error in monitoring loop: {e}")
@@ -212,36 +221,16 @@ class IntegratedSecurityApp:
             incident['keywords'] = result.get('details', {}).get('keywords', [])
         
         # Send to WebSocket clients
-        self.broadcast_incident(incident)
+        self.schedule_broadcast(incident)
         
         # Log incident with detailed information
-        print(f"AUDIO INCIDENT: {incident['message']}")
-        print(f"Audio Type: {incident['audio_type']}")
-        if incident.get('text'):
-            print(f"Transcribed Text: {incident['text']}")
-        if incident.get('keywords'):
-            print(f"Detected Keywords: {incident['keywords']}")
-        print(f"Confidence: {incident['confidence']:.2f}")
-        print("---")
-    
-    async def broadcast_incident(self, incident: Dict[str, Any]):
-        """Broadcast incident to all WebSocket clients"""
-        if self.active_connections:
-            message = json.dumps({
-                'type': 'incident',
-                'data': incident
-            })
-            
-            # Send to all connected clients
-            for connection in self.active_connections:
-                try:
-                    await connection.send_text(message)
-                except:
-                    # Remove disconnected clients
-                    self.active_connections.remove(connection)
+        logger.info("AUDIO INCIDENT: %s | type=%s text=%r keywords=%s confidence=%.2f",
+                    incident['message'], incident['audio_type'], incident.get('text', ''),
+                    incident.get('keywords', []), incident['confidence'])
 
 def main():
     """Main entry point"""
+    log_listener = setup_logging()
     app = IntegratedSecurityApp()
     
     print("Starting Integrated Security Application with Audio Recognition...")
@@ -256,12 +245,18 @@ def main():
     print("- Spectral feature extraction")
     
     # Start the server
-    uvicorn.run(
-        app.app,
-        host="0.0.0.0",
-        port=8000,
-        log_level="info"
-    )
+    try:
+        uvicorn.run(
+            app.app,
+            host="0.0.0.0",
+            port=8000,
+            log_level="info",
+            loop="uvloop" if UVLOOP_AVAILABLE else "asyncio",
+            ws="websockets",
+            ws_max_size=1024 * 1024  # Clients only send keep-alive messages
+        )
+    finally:
+        log_listener.stop()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
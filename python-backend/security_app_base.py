@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Security App Base
+Incident broadcasting, WebSocket clients and the cached /status route shared by the security apps
+"""
+
+import asyncio
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+from typing import Dict, Any
+
+from fastapi import Response, WebSocket, WebSocketDisconnect
+import msgpack
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+def msgpack_default(obj):
+    """Pack numpy scalars and arrays as native values"""
+    return obj.tolist() if hasattr(obj, 'tolist') else str(obj)
+
+def setup_logging() -> logging.handlers.QueueListener:
+    """Route log records through a queue so formatting and output run on a background thread"""
+    log_queue = queue.Queue(-1)
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    listener = logging.handlers.QueueListener(log_queue, handler)
+    
+    root = logging.getLogger()
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(logging.INFO)
+    
+    listener.start()
+    return listener
+
+class SecurityAppBase:
+    def __init__(self):
+        # Subclasses create self.app and implement get_status_data
+        self._loop = None
+        self.events = None  # asyncio.Queue of incidents to broadcast
+        self.broadcast_task = None
+        self.incident_queue = queue.Queue(maxsize=256)  # Incidents waiting for the dispatch thread
+        self.dispatch_thread = None
+        
+        # Serialized /status response, reused for status_ttl seconds
+        self.status_cache = (0.0, b'')
+        self.status_ttl = 0.25
+        
+        # WebSocket connections
+        self._conns: Dict[int, WebSocket] = {}  # Keyed by a per-connection id
+        self._next_id = 0
+        self.send_semaphore = None  # Limits concurrent sends, created on the server loop
+    
+    def get_status_data(self) -> Dict[str, Any]:
+        """Return the /status payload"""
+        raise NotImplementedError
+    
+    def setup_common_routes(self):
+        """Setup the startup hook, /status and the WebSocket endpoint"""
+        
+        @self.app.on_event("startup")
+        async def startup():
+            # Incidents from the monitoring thread are broadcast by a consumer task
+            self._loop = asyncio.get_running_loop()
+            self.events = asyncio.Queue(maxsize=1024)
+            self.send_semaphore = asyncio.Semaphore(100)
+            self.broadcast_task = asyncio.create_task(self.broadcast_consumer())
+            self.dispatch_thread = threading.Thread(target=self.dispatch_loop, daemon=True)
+            self.dispatch_thread.start()
+        
+        @self.app.get("/status")
+        async def get_status():
+            now = time.monotonic()
+            cached_at, payload = self.status_cache
+            if payload and now - cached_at < self.status_ttl:
+                return Response(payload, media_type="application/json")
+            
+            status = self.get_status_data()
+            if ORJSON_AVAILABLE:
+                payload = orjson.dumps(status, option=orjson.OPT_SERIALIZE_NUMPY)
+            else:
+                payload = json.dumps(status).encode('utf-8')
+            self.status_cache = (now, payload)
+            return Response(payload, media_type="application/json")
+        
+        @self.app.websocket("/ws")
+        async def websocket_endpoint(websocket: WebSocket):
+            await websocket.accept()
+            cid = self._next_id
+            self._next_id += 1
+            self._conns[cid] = websocket
+            try:
+                while True:
+                    # Keep connection alive
+                    await websocket.receive_text()
+            except WebSocketDisconnect:
+                pass
+            finally:
+                self._conns.pop(cid, None)
+    
+    def invalidate_status(self):
+        """Drop the cached /status response"""
+        self.status_cache = (0.0, b'')
+    
+    def schedule_broadcast(self, incident: Dict[str, Any]):
+        """Queue an incident for broadcast from the monitoring thread"""
+        if self._loop is None:
+            return
+        
+        # Blocking put gives backpressure; drop only if the dispatcher stays stuck.
+        # Never waits on the server loop, which may be busy joining this thread
+        try:
+            self.incident_queue.put(incident, timeout=1.0)
+        except queue.Full:
+            logger.warning("Incident queue full, dropping %s", incident.get('type'))
+    
+    def dispatch_loop(self):
+        """Hand queued incidents to the server loop, waiting while its broadcast queue is full"""
+        while True:
+            incident = self.incident_queue.get()
+            try:
+                asyncio.run_coroutine_threadsafe(self.events.put(incident), self._loop).result()
+            except Exception as e:
+                logger.error("Error dispatching incident: %s", e)
+    
+    async def broadcast_consumer(self):
+        """Broadcast queued incidents to WebSocket clients"""
+        while True:
+            incident = await self.events.get()
+            try:
+                await self.broadcast_incident(incident)
+            except Exception as e:
+                logger.error("Error broadcasting incident: %s", e)
+    
+    async def broadcast_incident(self, incident: Dict[str, Any]):
+        """Broadcast incident to all WebSocket clients"""
+        if self._conns:
+            payload = {
+                'type': 'incident',
+                'data': incident
+            }
+            # Encode once as MessagePack and send the same bytes to every client
+            message = msgpack.packb(payload, use_bin_type=True, default=msgpack_default)
+            
+            # Send to all connected clients concurrently
+            items = list(self._conns.items())
+            results = await asyncio.gather(
+                *(self.send_to_client(connection, message) for _, connection in items)
+            )
+            
+            # Remove disconnected clients in one pass; ids are never reused
+            for (cid, _), sent in zip(items, results):
+                if not sent:
+                    self._conns.pop(cid, None)
+    
+    async def send_to_client(self, connection: WebSocket, message: bytes) -> bool:
+        """Send a message to one client, returning False if it failed"""
+        async with self.send_semaphore:
+            try:
+                await asyncio.wait_for(connection.send_bytes(message), timeout=5)
+                return True
+            except Exception:
+                # Close the socket so the endpoint's receive loop ends too
+                try:
+                    await connection.close()
+                except Exception:
+                    pass
+                return False
@@ -7,22 +7,31 @@ Combines object detection, voice monitoring, and real-time alerts
 import cv2
 import numpy as np
 import time
-import json
+import asyncio
 import threading
-import queue
+import logging
 from pathlib import Path
 from typing import Dict, Any, Optional, List
 import uvicorn
-from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-import base64
+
+try:
+    import uvloop
+    UVLOOP_AVAILABLE = True
+except ImportError:
+    UVLOOP_AVAILABLE = False  # Not available on Windows
 
 # Import our modules
+from security_app_base import SecurityAppBase, setup_logging
 from voice_monitor import VoiceMonitorModule
 from object_detect import ObjectDetectionModule
 
-class IntegratedSecurityApp:
+logger = logging.getLogger(__name__)
+
+class IntegratedSecurityApp(SecurityAppBase):
     def __init__(self):
+        super().__init__()
         self.app = FastAPI(title="Security Monitor API", version="1.0.0")
         self.setup_routes()
         self.setup_cors()
@@ -34,10 +43,8 @@ class IntegratedSecurityApp:
         
         # Threading
         self.monitoring_thread = None
-        self.incident_queue = queue.Queue()
-        
-        # WebSocket connections
-        self.active_connections: List[WebSocket] = []
+        self.stop_event = threading.Event()  # Wakes the monitoring thread on stop
+        self.frame_interval = 0.1  # 10 FPS
         
         # Initialize modules
         self.initialize_modules()
@@ -57,18 +64,12 @@ class IntegratedSecurityApp:
     def setup_routes(self):
         """Setup API routes"""
         
+        self.setup_common_routes()
+        
         @self.app.get("/")
         async def root():
             return {"message": "Security Monitor API", "status": "running"}
         
-        @self.app.get("/status")
-        async def get_status():
-            return {
-                "monitoring": self.is_monitoring,
-                "voice_monitor": self.voice_monitor.get_status() if self.voice_monitor else None,
-                "object_detector": "active" if self.object_detector else "inactive"
-            }
-        
         @self.app.post("/start_monitoring")
         async def start_monitoring():
             if not self.is_monitoring:
@@ -79,7 +80,8 @@ class IntegratedSecurityApp:
         @self.app.post("/stop_monitoring")
         async def stop_monitoring():
             if self.is_monitoring:
-                self.stop_monitoring()
+                # Joining the monitoring threads blocks, keep it off the server loop
+                await asyncio.get_running_loop().run_in_executor(None, self.stop_monitoring)
                 return {"message": "Monitoring stopped", "status": "success"}
             return {"message": "Monitoring not active", "status": "info"}
         
@@ -89,6 +91,7 @@ class IntegratedSecurityApp:
             keywords = data.get('keywords', [])
             if self.voice_monitor:
                 self.voice_monitor.update_keywords(keywords)
+                self.invalidate_status()
                 return {"message": "Keywords updated", "keywords": keywords}
             return {"message": "Voice monitor not available", "status": "error"}
         
@@ -98,19 +101,17 @@ class IntegratedSecurityApp:
             sensitivity = data.get('sensitivity', 0.7)
             if self.voice_monitor:
                 self.voice_monitor.update_sensitivity(sensitivity)
+                self.invalidate_status()
                 return {"message": "Sensitivity updated", "sensitivity": sensitivity}
             return {"message": "Voice monitor not available", "status": "error"}
-        
-        @self.app.websocket("/ws")
-        async def websocket_endpoint(websocket: WebSocket):
-            await websocket.accept()
-            self.active_connections.append(websocket)
-            try:
-                while True:
-                    # Keep connection alive
-                    await websocket.receive_text()
-            except WebSocketDisconnect:
-                self.active_connections.remove(websocket)
+    
+    def get_status_data(self) -> Dict[str, Any]:
+        """Return the /status payload"""
+        return {
+            "monitoring": self.is_monitoring,
+            "voice_monitor": self.voice_monitor.get_status() if self.voice_monitor else None,
+            "object_detector": "active" if self.object_detector else "inactive"
+        }
     
     def initialize_modules(self):
         """Initialize voice and object detection modules"""
@@ -144,6 +145,8 @@ class IntegratedSecurityApp:
             return
         
         self.is_monitoring = True
+        self.invalidate_status()
+        self.stop_event.clear()
         
         # Start voice monitoring
         if self.voice_monitor:
@@ -161,6 +164,8 @@ class IntegratedSecurityApp:
             return
         
         self.is_monitoring = False
+        self.stop_event.set()
+        self.invalidate_status()
         
         # Stop voice monitoring
         if self.voice_monitor:
@@ -174,12 +179,14 @@ class IntegratedSecurityApp:
     
     def monitor_loop(self):
         """Main monitoring loop"""
+        next_tick = time.monotonic()
         while self.is_monitoring:
             try:
                 # Process voice monitoring
                 voice_result = None
                 if self.voice_monitor:
-                    voice_result = self.voice_monitor.process_frame()
+                    # Poll without blocking, the loop is paced by the frame deadline below
+                    voice_result = self.voice_monitor.process_frame(timeout=0)
                 
                 # Process object detection (simulated for now)
                 object_result = None
@@ -195,7 +202,13 @@ class IntegratedSecurityApp:
                 if object_result:
                     self.handle_object_incident(object_result)
                 
-                time.sleep(0.1)  # 10 FPS
+                # Sleep only for what is left of the frame interval
+                next_tick += self.frame_interval
+                delay = next_tick - time.monotonic()
+                if delay > 0:
+                    self.stop_event.wait(delay)
+                else:
+                    next_tick = time.monotonic()
                 
             except Exception as e:
                 print(f"Error in monitoring loop: {e}")
@@ -213,10 +226,10 @@ class IntegratedSecurityApp:
         }
         
         # Send to WebSocket clients
-        self.broadcast_incident(incident)
+        self.schedule_broadcast(incident)
         
         # Log incident
-        print(f"VOICE INCIDENT: {incident['message']} (confidence: {incident['confidence']:.2f})")
+        logger.info("VOICE INCIDENT: %s (confidence: %.2f)", incident['message'], incident['confidence'])
     
     def handle_object_incident(self, result: Dict[str, Any]):
         """Handle object detection incidents"""
@@ -230,29 +243,14 @@ class IntegratedSecurityApp:
         }
         
         # Send to WebSocket clients
-        self.broadcast_incident(incident)
+        self.schedule_broadcast(incident)
         
         # Log incident
-        print(f"OBJECT INCIDENT: {incident['message']} (confidence: {incident['confidence']:.2f})")
-    
-    async def broadcast_incident(self, incident: Dict[str, Any]):
-        """Broadcast incident to all WebSocket clients"""
-        if self.active_connections:
-            message = json.dumps({
-                'type': 'incident',
-                'data': incident
-            })
-            
-            # Send to all connected clients
-            for connection in self.active_connections:
-                try:
-                    await connection.send_text(message)
-                except:
-                    # Remove disconnected clients
-                    self.active_connections.remove(connection)
+        logger.info("OBJECT INCIDENT: %s (confidence: %.2f)", incident['message'], incident['confidence'])
 
 def main():
     """Main entry point"""
+    log_listener = setup_logging()
     app = IntegratedSecurityApp()
     
     print("Starting Integrated Security Application...")
@@ -261,12 +259,18 @@ def main():
     print("API documentation: http://localhost:8000/docs")
     
     # Start the server
-    uvicorn.run(
-        app.app,
-        host="0.0.0.0",
-        port=8000,
-        log_level="info"
-    )
+    try:
+        uvicorn.run(
+            app.app,
+            host="0.0.0.0",
+            port=8000,
+            log_level="info",
+            loop="uvloop" if UVLOOP_AVAILABLE else "asyncio",
+            ws="websockets",
+            ws_max_size=1024 * 1024  # Clients only send keep-alive messages
+        )
+    finally:
+        log_listener.stop()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
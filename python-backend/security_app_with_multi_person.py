@@ -7,22 +7,32 @@ Combines object detection, audio monitoring, and multi-person detection
 import cv2
 import numpy as np
 import time
-import json
+import asyncio
 import threading
 import queue
+import logging
 from pathlib import Path
 from typing import Dict, Any, Optional, List
 import uvicorn
-from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-import base64
+
+try:
+    import uvloop
+    UVLOOP_AVAILABLE = True
+except ImportError:
+    UVLOOP_AVAILABLE = False  # Not available on Windows
 
 # Import our modules
+from security_app_base import SecurityAppBase, setup_logging
 from enhanced_audio_monitor import EnhancedAudioMonitor
 from multi_person_detector import MultiPersonDetector
 
-class IntegratedSecurityApp:
+logger = logging.getLogger(__name__)
+
+class IntegratedSecurityApp(SecurityAppBase):
     def __init__(self):
+        super().__init__()
         self.app = FastAPI(title="Security Monitor API with Multi-Person Detection", version="3.0.0")
         self.setup_routes()
         self.setup_cors()
@@ -34,10 +44,16 @@ class IntegratedSecurityApp:
         
         # Threading
         self.monitoring_thread = None
-        self.incident_queue = queue.Queue()
-        
-        # WebSocket connections
-        self.active_connections: List[WebSocket] = []
+        self.audio_thread = None  # Drains audio on its own cadence, independent of video backoff
+        self.stop_event = threading.Event()  # Wakes the monitoring thread on stop
+        self.frame_interval = 0.1  # 10 FPS
+        self.max_frame_interval = 1.0  # Slowest rate for a static scene (1 FPS)
+        self.camera_size = (320, 240)  # Capture at the detector input size
+        self.camera_fps = 15
+        self.tick_dt = self.frame_interval
+        self.frame_q = None  # Latest camera frame from the capture thread
+        self.capture_thread = None
+        self.capture_stop = None  # Set to make the capture thread release the camera and exit
         
         # Initialize modules
         self.initialize_modules()
@@ -57,19 +73,12 @@ class IntegratedSecurityApp:
     def setup_routes(self):
         """Setup API routes"""
         
+        self.setup_common_routes()
+        
         @self.app.get("/")
         async def root():
             return {"message": "Security Monitor API with Multi-Person Detection", "status": "running"}
         
-        @self.app.get("/status")
-        async def get_status():
-            return {
-                "monitoring": self.is_monitoring,
-                "audio_monitor": self.audio_monitor.get_status() if self.audio_monitor else None,
-                "multi_person_detector": self.multi_person_detector.get_status() if self.multi_person_detector else None,
-                "audio_statistics": self.audio_monitor.get_audio_statistics() if self.audio_monitor else None
-            }
-        
         @self.app.post("/start_monitoring")
         async def start_monitoring():
             if not self.is_monitoring:
@@ -80,7 +89,8 @@ class IntegratedSecurityApp:
         @self.app.post("/stop_monitoring")
         async def stop_monitoring():
             if self.is_monitoring:
-                self.stop_monitoring()
+                # Joining the monitoring threads blocks, keep it off the server loop
+                await asyncio.get_running_loop().run_in_executor(None, self.stop_monitoring)
                 return {"message": "Monitoring stopped", "status": "success"}
             return {"message": "Monitoring not active", "status": "info"}
         
@@ -89,6 +99,7 @@ class IntegratedSecurityApp:
             data = await request.json()
             if self.multi_person_detector:
                 self.multi_person_detector.update_config(data)
+                self.invalidate_status()
                 return {"message": "Multi-person detector config updated", "config": data}
             return {"message": "Multi-person detector not available", "status": "error"}
         
@@ -98,6 +109,7 @@ class IntegratedSecurityApp:
             keywords = data.get('keywords', [])
             if self.audio_monitor:
                 self.audio_monitor.update_keywords(keywords)
+                self.invalidate_status()
                 return {"message": "Audio keywords updated", "keywords": keywords}
             return {"message": "Audio monitor not available", "status": "error"}
         
@@ -109,17 +121,15 @@ class IntegratedSecurityApp:
                     "status": "success"
                 }
             return {"message": "Audio monitor not available", "status": "error"}
-        
-        @self.app.websocket("/ws")
-        async def websocket_endpoint(websocket: WebSocket):
-            await websocket.accept()
-            self.active_connections.append(websocket)
-            try:
-                while True:
-                    # Keep connection alive
-                    await websocket.receive_text()
-            except WebSocketDisconnect:
-                self.active_connections.remove(websocket)
+    
+    def get_status_data(self) -> Dict[str, Any]:
+        """Return the /status payload"""
+        return {
+            "monitoring": self.is_monitoring,
+            "audio_monitor": self.audio_monitor.get_status() if self.audio_monitor else None,
+            "multi_person_detector": self.multi_person_detector.get_status() if self.multi_person_detector else None,
+            "audio_statistics": self.audio_monitor.get_audio_statistics() if self.audio_monitor else None
+        }
     
     def initialize_modules(self):
         """Initialize all monitoring modules"""
@@ -142,7 +152,8 @@ class IntegratedSecurityApp:
                 'max_allowed_people': 1,  # Only 1 person allowed
                 'alert_threshold': 2,      # Alert when 2+ people detected
                 'detection_confidence': 0.5,
-                'alert_cooldown': 10       # 10 seconds between alerts
+                'alert_cooldown': 10,      # 10 seconds between alerts
+                'inference_size': max(self.camera_size)
             }
             self.multi_person_detector = MultiPersonDetector(multi_person_config)
             print("✓ Multi-person detector initialized")
@@ -156,6 +167,8 @@ class IntegratedSecurityApp:
             return
         
         self.is_monitoring = True
+        self.invalidate_status()
+        self.stop_event.clear()
         
         # Start enhanced audio monitoring
         if self.audio_monitor:
@@ -165,6 +178,10 @@ class IntegratedSecurityApp:
         self.monitoring_thread = threading.Thread(target=self.monitor_loop, daemon=True)
         self.monitoring_thread.start()
         
+        if self.audio_monitor:
+            self.audio_thread = threading.Thread(target=self.audio_loop, daemon=True)
+            self.audio_thread.start()
+        
         print("✓ Integrated monitoring with multi-person detection started")
     
     def stop_monitoring(self):
@@ -173,6 +190,8 @@ class IntegratedSecurityApp:
             return
         
         self.is_monitoring = False
+        self.stop_event.set()
+        self.invalidate_status()
         
         # Stop audio monitoring
         if self.audio_monitor:
@@ -181,6 +200,8 @@ class IntegratedSecurityApp:
         # Wait for monitoring thread
         if self.monitoring_thread:
             self.monitoring_thread.join(timeout=5)
+        if self.audio_thread:
+            self.audio_thread.join(timeout=5)
         
         print("✓ Monitoring stopped")
     
@@ -192,11 +213,26 @@ class IntegratedSecurityApp:
             print("❌ Cannot open camera for multi-person detection")
             return
         
+        # Request compressed MJPG frames at the detector input size to cut USB bandwidth
+        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.camera_size[0])
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.camera_size[1])
+        cap.set(cv2.CAP_PROP_FPS, self.camera_fps)
+        
+        # Read frames on a separate thread so capture overlaps detection
+        self.frame_q = queue.Queue(maxsize=1)
+        self.capture_stop = threading.Event()
+        self.capture_thread = threading.Thread(target=self.capture_loop,
+                                               args=(cap, self.frame_q, self.capture_stop), daemon=True)
+        self.capture_thread.start()
+        
         try:
+            next_tick = time.monotonic()
             while self.is_monitoring:
-                # Read camera frame
-                ret, frame = cap.read()
-                if not ret:
+                # Get latest camera frame
+                try:
+                    frame = self.frame_q.get(timeout=0.5)
+                except queue.Empty:
                     continue
                 
                 # Process multi-person detection
@@ -204,23 +240,75 @@ class IntegratedSecurityApp:
                 if self.multi_person_detector:
                     multi_person_result = self.multi_person_detector.process_frame(frame)
                 
-                # Process enhanced audio monitoring
-                audio_result = None
-                if self.audio_monitor:
-                    audio_result = self.audio_monitor.process_frame()
-                
                 # Handle results
                 if multi_person_result and multi_person_result.get('is_alert'):
                     self.handle_multi_person_incident(multi_person_result)
                 
-                if audio_result:
-                    self.handle_audio_incident(audio_result)
+                # Back off while the scene is static, snap back to full rate on change
+                if multi_person_result and not multi_person_result.get('scene_changed', True):
+                    self.tick_dt = min(self.tick_dt * 1.1, self.max_frame_interval)
+                else:
+                    self.tick_dt = self.frame_interval
                 
-                time.sleep(0.1)  # 10 FPS
+                # Sleep only for what is left of the frame interval
+                next_tick += self.tick_dt
+                delay = next_tick - time.monotonic()
+                if delay > 0:
+                    self.stop_event.wait(delay)
+                else:
+                    next_tick = time.monotonic()
                 
         except Exception as e:
             print(f"Error in monitoring loop: {e}")
         finally:
+            # The capture thread owns the camera and releases it once its read returns
+            self.capture_stop.set()
+            self.capture_thread.join(timeout=2)
+            if self.capture_thread.is_alive():
+                print("⚠️  Camera read still blocked, it will be released when the read returns")
+    
+    def audio_loop(self):
+        """Process audio chunks as soon as they are captured"""
+        while self.is_monitoring:
+            try:
+                # Wait until the audio monitor has captured a chunk
+                if not self.audio_monitor.audio_ready.wait(timeout=1.0):
+                    continue
+                self.audio_monitor.audio_ready.clear()
+                
+                # Process all pending audio chunks
+                audio_result = self.audio_monitor.process_frame()
+                while audio_result:
+                    # Every chunk yields a result, only recognized speech is an incident
+                    if audio_result.get('detected') or audio_result.get('text'):
+                        self.handle_audio_incident(audio_result)
+                    audio_result = self.audio_monitor.process_frame()
+                
+            except Exception as e:
+                print(f"Error in audio loop: {e}")
+                time.sleep(1)
+    
+    def capture_loop(self, cap: cv2.VideoCapture, frame_q: queue.Queue, stop: threading.Event):
+        """Read camera frames, keeping only the most recent one"""
+        try:
+            while not stop.is_set():
+                ret, frame = cap.read()
+                if not ret:
+                    # Back off instead of spinning while the camera is failing or unplugged
+                    stop.wait(0.05)
+                    continue
+                
+                try:
+                    frame_q.put_nowait(frame)
+                except queue.Full:
+                    # Drop the stale frame in favour of the new one
+                    try:
+                        frame_q.get_nowait()
+                    except queue.Empty:
+                        pass
+                    frame_q.put_nowait(frame)
+        finally:
+            # Release only here, so the camera is never released mid-read
             cap.release()
     
     def handle_multi_person_incident(self, result: Dict[str, Any]):
@@ -237,13 +325,11 @@ class IntegratedSecurityApp:
         }
         
         # Send to WebSocket clients
-        self.broadcast_incident(incident)
+        self.schedule_broadcast(incident)
         
         # Log incident
-        print(f"MULTI-PERSON ALERT: {incident['message']}")
-        print(f"People detected: {incident['person_count']}")
-        print(f"Max allowed: {incident['max_allowed']}")
-        print("---")
+        logger.info("MULTI-PERSON ALERT: people=%d max=%d",
+                    incident['person_count'], incident['max_allowed'])
     
     def handle_audio_incident(self, result: Dict[str, Any]):
         """Handle audio monitoring incidents"""
@@ -266,36 +352,16 @@ class IntegratedSecurityApp:
             incident['keywords'] = result.get('details', {}).get('keywords', [])
         
         # Send to WebSocket clients
-        self.broadcast_incident(incident)
+        self.schedule_broadcast(incident)
         
         # Log incident with detailed information
-        print(f"AUDIO INCIDENT: {incident['message']}")
-        print(f"Audio Type: {incident['audio_type']}")
-        if incident.get('text'):
-            print(f"Transcribed Text: {incident['text']}")
-        if incident.get('keywords'):
-            print(f"Detected Keywords: {incident['keywords']}")
-        print(f"Confidence: {incident['confidence']:.2f}")
-        print("---")
-    
-    async def broadcast_incident(self, incident: Dict[str, Any]):
-        """Broadcast incident to all WebSocket clients"""
-        if self.active_connections:
-            message = json.dumps({
-                'type': 'incident',
-                'data': incident
-            })
-            
-            # Send to all connected clients
-            for connection in self.active_connections:
-                try:
-                    await connection.send_text(message)
-                except:
-                    # Remove disconnected clients
-                    self.active_connections.remove(connection)
+        logger.info("AUDIO INCIDENT: %s | type=%s text=%r keywords=%s confidence=%.2f",
+                    incident['message'], incident['audio_type'], incident.get('text', ''),
+                    incident.get('keywords', []), incident['confidence'])
 
 def main():
     """Main entry point"""
+    log_listener = setup_logging()
     app = IntegratedSecurityApp()
     
     print("Starting Integrated Security Application with Multi-Person Detection...")
@@ -310,12 +376,18 @@ def main():
     print("- Real-time alerts and notifications")
     
     # Start the server
-    uvicorn.run(
-        app.app,
-        host="0.0.0.0",
-        port=8000,
-        log_level="info"
-    )
+    try:
+        uvicorn.run(
+            app.app,
+            host="0.0.0.0",
+            port=8000,
+            log_level="info",
+            loop="uvloop" if UVLOOP_AVAILABLE else "asyncio",
+            ws="websockets",
+            ws_max_size=1024 * 1024  # Clients only send keep-alive messages
+        )
+    finally:
+        log_listener.stop()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
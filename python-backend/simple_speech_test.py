@@ -6,6 +6,33 @@ Shows exactly what you're speaking in real-time
 
 import speech_recognition as sr
 import time
+import collections
+
+from keyword_matcher import KeywordMatcher
+
+try:
+    import pyaudio
+    import webrtcvad
+    from audio_interface import get_pyaudio
+    from google.cloud import speech
+    STREAMING_AVAILABLE = True
+except ImportError:
+    STREAMING_AVAILABLE = False
+    print("webrtcvad/google-cloud-speech not available, using single-phrase recognition")
+
+# Streaming capture settings (webrtcvad accepts 10/20/30 ms frames at 16 kHz)
+SAMPLE_RATE = 16000
+FRAME_MS = 20
+FRAME_SAMPLES = SAMPLE_RATE * FRAME_MS // 1000
+PRE_ROLL_FRAMES = 10  # 200 ms of audio kept from before speech onset
+TRAILING_SILENCE_FRAMES = 400 // FRAME_MS  # End the utterance after 400 ms of silence
+
+SUSPICIOUS_KEYWORDS = [
+    'help', 'emergency', 'danger', 'fire', 'police', 'attack',
+    'threat', 'dangerous', 'weapon', 'gun', 'knife', 'fight',
+    'intruder', 'break in', 'robbery', 'assault', 'kill', 'hurt',
+    'bomb', 'explosive', 'terrorist', 'hostage', 'scream', 'cry'
+]
 
 def listen_and_transcribe():
     """Listen to microphone and transcribe speech"""
@@ -80,6 +107,97 @@ def listen_and_transcribe():
         print("\n🛑 Stopping speech recognition...")
         print("✅ Speech recognition stopped")
 
+def wait_for_speech(stream, vad):
+    """Read frames until the VAD detects speech, returning the pre-roll frames"""
+    pre_roll = collections.deque(maxlen=PRE_ROLL_FRAMES)
+    while True:
+        frame = stream.read(FRAME_SAMPLES, exception_on_overflow=False)
+        pre_roll.append(frame)
+        if vad.is_speech(frame, SAMPLE_RATE):
+            return list(pre_roll)
+
+def utterance_requests(stream, vad, first_frames):
+    """Yield audio requests for one utterance, ending on trailing silence"""
+    for frame in first_frames:
+        yield speech.StreamingRecognizeRequest(audio_content=frame)
+    
+    # Keep streaming while the recognizer works on what was already sent
+    silent_frames = 0
+    while silent_frames < TRAILING_SILENCE_FRAMES:
+        frame = stream.read(FRAME_SAMPLES, exception_on_overflow=False)
+        yield speech.StreamingRecognizeRequest(audio_content=frame)
+        silent_frames = 0 if vad.is_speech(frame, SAMPLE_RATE) else silent_frames + 1
+
+def stream_and_transcribe(client):
+    """Stream VAD-gated microphone audio to Google Cloud Speech"""
+    
+    streaming_config = speech.StreamingRecognitionConfig(
+        config=speech.RecognitionConfig(
+            encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
+            sample_rate_hertz=SAMPLE_RATE,
+            language_code="en-US",
+        ),
+        interim_results=True,
+    )
+    vad = webrtcvad.Vad(2)
+    keyword_matcher = KeywordMatcher(SUSPICIOUS_KEYWORDS)
+    
+    audio = get_pyaudio()
+    stream = audio.open(
+        format=pyaudio.paInt16,
+        channels=1,
+        rate=SAMPLE_RATE,
+        input=True,
+        frames_per_buffer=FRAME_SAMPLES
+    )
+    
+    print("🎤 STREAMING SPEECH RECOGNITION TEST")
+    print("=" * 50)
+    print("Speak clearly into your microphone...")
+    print("Partial transcripts appear while you speak")
+    print("Press Ctrl+C to stop")
+    print("=" * 50)
+    
+    try:
+        while True:
+            print("\n🎯 Listening... (speak now)")
+            first_frames = wait_for_speech(stream, vad)
+            print("✅ Speech started, streaming...")
+            
+            try:
+                requests = utterance_requests(stream, vad, first_frames)
+                for response in client.streaming_recognize(streaming_config, requests):
+                    for result in response.results:
+                        if not result.alternatives:
+                            continue
+                        
+                        best_result = result.alternatives[0]
+                        if not result.is_final:
+                            print(f"💬 {best_result.transcript}")
+                            continue
+                        
+                        print("\n" + "="*50)
+                        print("🎯 SPEECH DETECTED!")
+                        print("="*50)
+                        print(f"📝 You said: \"{best_result.transcript}\"")
+                        print(f"📊 Confidence: {best_result.confidence:.2f}")
+                        print(f"⏰ Time: {time.strftime('%H:%M:%S')}")
+                        
+                        keywords = keyword_matcher.find(best_result.transcript)
+                        if keywords:
+                            print(f"⚠️  SUSPICIOUS KEYWORDS: {keywords}")
+                        print("="*50)
+                        
+            except Exception as e:
+                print(f"⚠️  Speech recognition error: {e}")
+                
+    except KeyboardInterrupt:
+        print("\n🛑 Stopping speech recognition...")
+    finally:
+        stream.stop_stream()
+        stream.close()
+        print("✅ Speech recognition stopped")
+
 def test_microphone():
     """Test if microphone is working"""
     print("🔍 Testing microphone...")
@@ -106,8 +224,18 @@ def main():
     print("🌍 Supports multiple languages (auto-detected)")
     print("=" * 50)
     
-    # Start listening
-    listen_and_transcribe()
+    # Start listening, streaming needs Google Cloud credentials
+    client = None
+    if STREAMING_AVAILABLE:
+        try:
+            client = speech.SpeechClient()
+        except Exception as e:
+            print(f"⚠️  Google Cloud Speech unavailable, using SpeechRecognition: {e}")
+    
+    if client is not None:
+        stream_and_transcribe(client)
+    else:
+        listen_and_transcribe()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
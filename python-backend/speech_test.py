@@ -8,32 +8,51 @@ import pyaudio
 import numpy as np
 import time
 import json
+import queue
+from collections import OrderedDict
+from pathlib import Path
 import speech_recognition as sr
 from typing import Dict, Any
 
+from audio_features import vad_features, downsample_to_8k, warmup as warmup_audio_features
+from audio_interface import get_pyaudio
+
+CACHE_PATH = Path(__file__).parent / 'speech_cache.json'
+
 class SpeechRecognitionTest:
     def __init__(self):
         self.sample_rate = 16000
-        self.chunk_size = 1024
+        self.chunk_size = 320  # 20 ms, one WebRTC VAD frame
         self.channels = 1
         self.format = pyaudio.paInt16
         
         # Audio setup
-        self.audio = pyaudio.PyAudio()
+        self.audio = get_pyaudio()
         self.stream = None
         self.is_listening = False
         
+        # Captured chunks, filled by the stream callback
+        self.audio_queue = queue.Queue(maxsize=100)  # 2 seconds of 20 ms chunks
+        
         # Speech recognition
         self.recognizer = sr.Recognizer()
         self.recognizer.energy_threshold = 3000
         self.recognizer.dynamic_energy_threshold = True
         self.recognizer.pause_threshold = 0.8
         
-        # Speech buffer
-        self.speech_buffer = []
+        # Speech buffer (preallocated, holds up to 3 seconds)
+        self._buf = np.empty(self.sample_rate * 3, dtype=np.int16)
+        self._buf_n = 0
         self.last_speech_time = 0
         self.speech_timeout = 1.5  # seconds
         
+        # Recent transcriptions keyed by acoustic fingerprint (LRU, kept between runs)
+        self.max_cache_size = 256
+        self.transcription_cache = self.load_cache()
+        
+        # Compile the VAD kernel before audio starts
+        warmup_audio_features()
+        
         print("🎤 Speech Recognition Test Initialized")
         print("=" * 50)
         print("Speak clearly into your microphone...")
@@ -48,7 +67,8 @@ class SpeechRecognitionTest:
                 channels=self.channels,
                 rate=self.sample_rate,
                 input=True,
-                frames_per_buffer=self.chunk_size
+                frames_per_buffer=self.chunk_size,
+                stream_callback=self.audio_callback
             )
             
             self.is_listening = True
@@ -61,6 +81,16 @@ class SpeechRecognitionTest:
         
         return True
     
+    def audio_callback(self, in_data, frame_count, time_info, status):
+        """Callback for audio stream"""
+        try:
+            self.audio_queue.put_nowait(in_data)
+        except queue.Full:
+            # Consumer is behind, drop this chunk
+            pass
+        
+        return (None, pyaudio.paContinue)
+    
     def stop_listening(self):
         """Stop listening for speech"""
         self.is_listening = False
@@ -70,24 +100,43 @@ class SpeechRecognitionTest:
             self.stream.close()
             self.stream = None
         
-        if self.audio:
-            self.audio.terminate()
-        
+        self.save_cache()
         print("🛑 Microphone deactivated")
     
+    def load_cache(self) -> OrderedDict:
+        """Load the transcription cache saved by a previous run"""
+        try:
+            with open(CACHE_PATH, 'r', encoding='utf-8') as f:
+                return OrderedDict((key, result) for key, result in json.load(f))
+        except FileNotFoundError:
+            return OrderedDict()
+        except Exception as e:
+            print(f"⚠️  Could not load transcription cache: {e}")
+            return OrderedDict()
+    
+    def save_cache(self):
+        """Persist the transcription cache for the next run"""
+        try:
+            with open(CACHE_PATH, 'w', encoding='utf-8') as f:
+                json.dump(list(self.transcription_cache.items()), f)
+        except Exception as e:
+            print(f"⚠️  Could not save transcription cache: {e}")
+    
+    def fingerprint(self, audio_data: np.ndarray) -> int:
+        """Hash a coarse 16-band log spectral envelope of the utterance"""
+        spectrum = np.abs(np.fft.rfft(audio_data[::4]))
+        # Split the whole spectrum into 16 bands so the bands do not depend on utterance length
+        bands = np.array([band.mean() for band in np.array_split(spectrum, 16)])
+        return hash(tuple(np.round(np.log1p(bands), 1).tolist()))
+    
     def detect_speech(self, audio_data: np.ndarray) -> bool:
         """Detect if audio contains speech"""
         if len(audio_data) == 0:
             return False
         
-        # Convert to float
-        audio_float = audio_data.astype(np.float32) / 32768.0
-        
-        # Calculate RMS (volume)
-        rms = np.sqrt(np.mean(audio_float**2))
-        
-        # Calculate zero crossing rate (speech characteristic)
-        zero_crossing_rate = np.sum(np.diff(np.sign(audio_float))) / len(audio_float)
+        # Calculate RMS (volume) and zero crossing rate (speech characteristic) in one pass
+        rms, zero_crossing_rate = vad_features(audio_data)
+        rms /= 32768.0
         
         # Speech detection criteria
         if rms > 0.01 and zero_crossing_rate > 0.1:
@@ -100,10 +149,26 @@ class SpeechRecognitionTest:
         if len(audio_data) == 0:
             return {'text': '', 'confidence': 0.0, 'language': 'unknown'}
         
+        # Repeated utterances skip the network round-trip
+        key = self.fingerprint(audio_data)
+        cached = self.transcription_cache.get(key)
+        if cached is not None:
+            self.transcription_cache.move_to_end(key)
+            return cached
+        
+        result = self.recognize(audio_data)
+        if result['text']:
+            self.transcription_cache[key] = result
+            if len(self.transcription_cache) > self.max_cache_size:
+                self.transcription_cache.popitem(last=False)
+        
+        return result
+    
+    def recognize(self, audio_data: np.ndarray) -> Dict[str, Any]:
+        """Transcribe speech with Google Speech Recognition"""
         try:
-            # Convert to AudioData format
-            audio_bytes = audio_data.tobytes()
-            audio_data_sr = sr.AudioData(audio_bytes, self.sample_rate, 2)
+            # Send telephone-band 8 kHz audio, half the upload of 16 kHz
+            audio_data_sr = sr.AudioData(downsample_to_8k(audio_data), 8000, 2)
             
             # Try Google Speech Recognition with auto-detection
             text = self.recognizer.recognize_google(
@@ -143,26 +208,28 @@ class SpeechRecognitionTest:
         
         try:
             while self.is_listening:
-                # Read audio data
-                audio_data = self.stream.read(self.chunk_size, exception_on_overflow=False)
+                # Wait for audio captured by the stream callback
+                try:
+                    audio_data = self.audio_queue.get(timeout=0.5)
+                except queue.Empty:
+                    continue
                 audio_array = np.frombuffer(audio_data, dtype=np.int16)
                 
                 # Detect speech
                 if self.detect_speech(audio_array):
                     # Accumulate speech audio
-                    self.speech_buffer.extend(audio_array)
+                    n = min(len(audio_array), len(self._buf) - self._buf_n)
+                    self._buf[self._buf_n:self._buf_n + n] = audio_array[:n]
+                    self._buf_n += n
                     self.last_speech_time = time.time()
                     
                     # Process when buffer is full or timeout reached
-                    if (len(self.speech_buffer) >= self.sample_rate * 2 or  # 2 seconds
+                    if (self._buf_n >= self.sample_rate * 2 or  # 2 seconds
                         time.time() - self.last_speech_time > self.speech_timeout):
                         
-                        if len(self.speech_buffer) > self.sample_rate * 0.5:  # At least 0.5 seconds
-                            # Convert to numpy array
-                            speech_array = np.array(self.speech_buffer, dtype=np.int16)
-                            
-                            # Transcribe speech
-                            result = self.transcribe_speech(speech_array)
+                        if self._buf_n > self.sample_rate * 0.5:  # At least 0.5 seconds
+                            # Transcribe speech from a view of the buffer
+                            result = self.transcribe_speech(self._buf[:self._buf_n])
                             
                             if result['text']:
                                 # Display results
@@ -174,9 +241,7 @@ class SpeechRecognitionTest:
                                 print("-" * 50)
                             
                             # Clear buffer
-                            self.speech_buffer = []
-                
-                time.sleep(0.1)
+                            self._buf_n = 0
                 
         except KeyboardInterrupt:
             print("\n🛑 Stopping speech recognition...")
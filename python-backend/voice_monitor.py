@@ -13,6 +13,22 @@ import threading
 from pathlib import Path
 from typing import Dict, List, Optional, Any
 import queue
+import string
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from audio_features import vad_features, downsample_to_8k, warmup as warmup_audio_features
+from audio_interface import get_pyaudio
+from keyword_matcher import KeywordMatcher
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Vosk returns its results as JSON strings
+json_loads = orjson.loads if ORJSON_AVAILABLE else json.loads
 
 try:
     import vosk
@@ -21,6 +37,13 @@ except ImportError:
     VOSK_AVAILABLE = False
     print("Vosk not available")
 
+try:
+    import webrtcvad
+    WEBRTCVAD_AVAILABLE = True
+except ImportError:
+    WEBRTCVAD_AVAILABLE = False
+    print("webrtcvad not available, using RMS speech detection")
+
 try:
     import speech_recognition as sr
     SPEECH_RECOGNITION_AVAILABLE = True
@@ -37,14 +60,17 @@ class VoiceMonitorModule:
             'threat', 'dangerous', 'weapon', 'gun', 'knife', 'fight'
         ])
         
+        # Suspicious keyword lookups (rebuilt when keywords change)
+        self.set_keyword_lookups(self.suspicious_keywords)
+        
         # Audio settings
-        self.chunk_size = 1024
+        self.chunk_size = 320  # 20 ms, one WebRTC VAD frame
         self.sample_rate = 16000
         self.channels = 1
         self.format = pyaudio.paInt16
         
         # Initialize audio
-        self.audio = pyaudio.PyAudio()
+        self.audio = get_pyaudio()
         self.stream = None
         
         # Initialize speech recognition
@@ -54,11 +80,33 @@ class VoiceMonitorModule:
         self.is_running = False
         self.audio_queue = queue.Queue()
         self.result_queue = queue.Queue()
+        # Set whenever new audio or a finished result is queued
+        self._ready = threading.Event()
+        
+        # Transcription workers (Vosk keeps stream state, so it gets a single worker)
+        self._pool = ThreadPoolExecutor(max_workers=1 if VOSK_AVAILABLE else 2)
+        self._pending_futures = deque()
+        self.max_pending_transcriptions = 4
         
-        # Audio buffer
-        self.audio_buffer = []
+        # Utterance collected in the callback and queued once speech ends
+        self._pending = bytearray()
+        self._pending_thresh = self.sample_rate * 2 * 10  # Cap at 10 seconds of int16 samples
+        self._silent_chunks = 0
+        self.utterance_hangover = 15  # Unvoiced 20 ms chunks that end an utterance
+        
+        # Audio buffer (ring of the most recent samples)
         self.buffer_duration = 3.0  # seconds
         self.max_buffer_size = int(self.sample_rate * self.buffer_duration)
+        self.audio_buffer = np.zeros(self.max_buffer_size, dtype=np.int16)
+        self._buf_pos = 0
+        self._buf_filled = 0
+        
+        # WebRTC VAD on 20 ms frames, higher sensitivity keeps more borderline speech
+        self.vad_frame_bytes = self.sample_rate // 50 * 2
+        self._vad = webrtcvad.Vad(self.vad_aggressiveness()) if WEBRTCVAD_AVAILABLE else None
+        
+        # Compile the VAD kernel before the audio callback needs it
+        warmup_audio_features()
         
         print("Voice monitor module initialized")
     
@@ -81,6 +129,11 @@ class VoiceMonitorModule:
             self.recognizer.dynamic_energy_threshold = True
             print("✓ Speech recognition initialized")
     
+    def set_keyword_lookups(self, keywords: List[str]):
+        """Split keywords into a single-word set and a multi-word phrase matcher"""
+        self._kw_set = frozenset(k.strip().lower() for k in keywords if len(k.split()) == 1)
+        self.phrase_matcher = KeywordMatcher([k for k in keywords if len(k.split()) > 1])
+    
     def start_audio_stream(self):
         """Start audio stream for continuous monitoring"""
         try:
@@ -102,34 +155,67 @@ class VoiceMonitorModule:
     def audio_callback(self, in_data, frame_count, time_info, status):
         """Callback for audio stream"""
         if self.is_running:
-            # Convert audio data to numpy array
+            # View the captured bytes as samples (no copy)
             audio_data = np.frombuffer(in_data, dtype=np.int16)
             
-            # Add to buffer
-            self.audio_buffer.extend(audio_data)
-            
-            # Keep buffer size manageable
-            if len(self.audio_buffer) > self.max_buffer_size:
-                self.audio_buffer = self.audio_buffer[-self.max_buffer_size:]
+            # Add to ring buffer, overwriting the oldest samples
+            samples = audio_data[-self.max_buffer_size:]
+            end = self._buf_pos + len(samples)
+            if end <= self.max_buffer_size:
+                self.audio_buffer[self._buf_pos:end] = samples
+            else:
+                split = self.max_buffer_size - self._buf_pos
+                self.audio_buffer[self._buf_pos:] = samples[:split]
+                self.audio_buffer[:end - self.max_buffer_size] = samples[split:]
+            self._buf_pos = end % self.max_buffer_size
+            self._buf_filled = min(self._buf_filled + len(samples), self.max_buffer_size)
             
             # Check for speech activity
-            if self.detect_speech_activity(audio_data):
-                # Process audio for speech recognition
-                self.audio_queue.put(audio_data.copy())
+            is_speech = self.detect_speech_activity(in_data)
+            if is_speech:
+                self._silent_chunks = 0
+            elif self._pending:
+                self._silent_chunks += 1
+            
+            # Keep short pauses inside the utterance
+            if is_speech or self._pending:
+                self._pending += in_data
+            
+            # Queue the utterance once speech has ended or it reaches the length cap
+            if self._pending and (self._silent_chunks >= self.utterance_hangover or
+                                  len(self._pending) >= self._pending_thresh):
+                self.audio_queue.put(bytes(self._pending))
+                self._ready.set()
+                self._pending.clear()
+                self._silent_chunks = 0
         
         return (in_data, pyaudio.paContinue)
     
-    def detect_speech_activity(self, audio_data: np.ndarray) -> bool:
+    def vad_aggressiveness(self) -> int:
+        """Map sensitivity (0-1) to a WebRTC VAD mode (0-3), inverted since mode 3 drops the most speech"""
+        return 3 - min(3, round(self.sensitivity * 3))
+    
+    def detect_speech_activity(self, in_data: bytes) -> bool:
         """Detect if there's speech activity in the audio"""
+        if self._vad is not None:
+            # WebRTC VAD only accepts 10/20/30 ms frames
+            frames = memoryview(in_data)
+            return any(
+                self._vad.is_speech(frames[i:i + self.vad_frame_bytes], self.sample_rate)
+                for i in range(0, len(in_data) - self.vad_frame_bytes + 1, self.vad_frame_bytes)
+            )
+        
+        audio_data = np.frombuffer(in_data, dtype=np.int16)
+        
         # Calculate RMS (Root Mean Square) for volume detection
-        rms = np.sqrt(np.mean(audio_data.astype(np.float32) ** 2))
+        rms, _ = vad_features(audio_data)
         
         # Threshold for speech detection (adjust based on environment)
         threshold = 1000  # Adjust this value based on your microphone
         
         return rms > threshold
     
-    def process_audio_chunk(self, audio_data: np.ndarray) -> Optional[str]:
+    def process_audio_chunk(self, audio_data: bytes) -> Optional[str]:
         """Process audio chunk for speech recognition"""
         try:
             if VOSK_AVAILABLE:
@@ -142,33 +228,25 @@ class VoiceMonitorModule:
             print(f"Error processing audio: {e}")
             return None
     
-    def process_with_vosk(self, audio_data: np.ndarray) -> Optional[str]:
+    def process_with_vosk(self, audio_data: bytes) -> Optional[str]:
         """Process audio using Vosk"""
         try:
-            # Convert to bytes
-            audio_bytes = audio_data.tobytes()
+            # Each queued item is a whole utterance, decode it in one pass
+            self.vosk_recognizer.AcceptWaveform(audio_data)
+            result = json_loads(self.vosk_recognizer.FinalResult())
+            text = result.get('text', '').strip()
+            return text if text else None
             
-            # Process with Vosk
-            if self.vosk_recognizer.AcceptWaveform(audio_bytes):
-                result = json.loads(self.vosk_recognizer.Result())
-                text = result.get('text', '').strip()
-                return text if text else None
-            else:
-                # Partial result
-                partial = json.loads(self.vosk_recognizer.PartialResult())
-                text = partial.get('partial', '').strip()
-                return text if text else None
-                
         except Exception as e:
             print(f"Error in Vosk processing: {e}")
             return None
     
-    def process_with_speech_recognition(self, audio_data: np.ndarray) -> Optional[str]:
+    def process_with_speech_recognition(self, audio_data: bytes) -> Optional[str]:
         """Process audio using speech_recognition"""
         try:
-            # Convert to AudioData format
-            audio_data_bytes = audio_data.tobytes()
-            audio = sr.AudioData(audio_data_bytes, self.sample_rate, 2)
+            # Send telephone-band 8 kHz audio, half the upload of 16 kHz
+            samples = np.frombuffer(audio_data, dtype=np.int16)
+            audio = sr.AudioData(downsample_to_8k(samples), 8000, 2)
             
             # Recognize speech
             text = self.recognizer.recognize_google(audio)
@@ -185,30 +263,14 @@ class VoiceMonitorModule:
             return None
     
     def analyze_text(self, text: str) -> Optional[Dict[str, Any]]:
-        """Analyze text for suspicious keywords and patterns"""
+        """Analyze text for suspicious keywords"""
         if not text:
             return None
         
-        text_lower = text.lower()
-        detected_keywords = []
-        
-        # Check for suspicious keywords
-        for keyword in self.suspicious_keywords:
-            if keyword.lower() in text_lower:
-                detected_keywords.append(keyword)
-        
-        # Check for suspicious patterns
-        suspicious_patterns = [
-            r'\b(help|emergency|danger)\b',
-            r'\b(fire|police|attack)\b',
-            r'\b(threat|dangerous|weapon)\b',
-            r'\b(gun|knife|fight)\b'
-        ]
-        
-        import re
-        for pattern in suspicious_patterns:
-            if re.search(pattern, text_lower):
-                detected_keywords.extend(re.findall(pattern, text_lower))
+        # Whole-word keywords are one set lookup per token, phrases go through the matcher
+        tokens = (token.strip(string.punctuation) for token in text.lower().split())
+        detected_keywords = list(dict.fromkeys(token for token in tokens if token in self._kw_set))
+        detected_keywords += self.phrase_matcher.find(text)
         
         if detected_keywords:
             # Calculate confidence based on keyword frequency and sensitivity
@@ -221,39 +283,78 @@ class VoiceMonitorModule:
                 'confidence': confidence,
                 'details': {
                     'text': text,
-                    'keywords': list(set(detected_keywords)),
+                    'keywords': detected_keywords,
                     'timestamp': time.time()
                 }
             }
         
         return None
     
-    def process_frame(self) -> Optional[Dict[str, Any]]:
+    def process_frame(self, timeout: float = 0.1) -> Optional[Dict[str, Any]]:
         """Process current audio frame (called by main app)"""
         if not self.is_running:
             return None
         
+        # A finished result needs no waiting
         try:
-            # Get audio data from queue
-            audio_data = self.audio_queue.get_nowait()
-            
-            # Process for speech recognition
-            text = self.process_audio_chunk(audio_data)
-            
-            if text:
-                # Analyze text for suspicious content
-                result = self.analyze_text(text)
-                if result:
-                    return result
-            
+            return self.result_queue.get_nowait()
+        except queue.Empty:
+            pass
+        
+        # Wake as soon as either new audio or a finished transcription arrives
+        if timeout > 0 and self.audio_queue.empty():
+            self._ready.wait(timeout)
+        self._ready.clear()
+        
+        try:
+            # Transcribe on the worker pool so capture keeps going during the round-trip
+            while True:
+                self.submit_transcription(self.audio_queue.get_nowait())
         except queue.Empty:
-            # No audio data available
             pass
         except Exception as e:
             print(f"Error processing audio frame: {e}")
         
+        # Return the next finished result, if any
+        try:
+            return self.result_queue.get_nowait()
+        except queue.Empty:
+            return None
+    
+    def submit_transcription(self, audio_data: bytes):
+        """Queue audio for transcription, dropping the oldest waiting job when saturated"""
+        while self._pending_futures and self._pending_futures[0].done():
+            self._pending_futures.popleft()
+        while len(self._pending_futures) >= self.max_pending_transcriptions:
+            self._pending_futures.popleft().cancel()
+        
+        future = self._pool.submit(self.transcribe_and_analyze, audio_data)
+        future.add_done_callback(self.on_transcription_done)
+        self._pending_futures.append(future)
+    
+    def transcribe_and_analyze(self, audio_data: bytes) -> Optional[Dict[str, Any]]:
+        """Transcribe audio and analyze the text (runs on a worker thread)"""
+        text = self.process_audio_chunk(audio_data)
+        if text:
+            # Analyze text for suspicious content
+            return self.analyze_text(text)
         return None
     
+    def on_transcription_done(self, future):
+        """Route a finished transcription back through the result queue"""
+        if future.cancelled():
+            return
+        
+        try:
+            result = future.result()
+        except Exception as e:
+            print(f"Error processing audio frame: {e}")
+            return
+        
+        if result:
+            self.result_queue.put(result)
+            self._ready.set()
+    
     def start(self):
         """Start voice monitoring"""
         if self.is_running:
@@ -278,6 +379,10 @@ class VoiceMonitorModule:
             self.stream.close()
             self.stream = None
         
+        # Drop transcriptions that have not started yet
+        while self._pending_futures:
+            self._pending_futures.popleft().cancel()
+        
         print("Voice monitoring stopped")
     
     def get_status(self) -> Dict[str, Any]:
@@ -288,17 +393,20 @@ class VoiceMonitorModule:
             'suspicious_keywords': self.suspicious_keywords,
             'vosk_available': VOSK_AVAILABLE,
             'speech_recognition_available': SPEECH_RECOGNITION_AVAILABLE,
-            'audio_buffer_size': len(self.audio_buffer)
+            'audio_buffer_size': self._buf_filled
         }
     
     def update_keywords(self, keywords: List[str]):
         """Update suspicious keywords"""
         self.suspicious_keywords = keywords
+        self.set_keyword_lookups(keywords)
         print(f"Updated suspicious keywords: {keywords}")
     
     def update_sensitivity(self, sensitivity: float):
         """Update sensitivity threshold"""
         self.sensitivity = max(0.0, min(1.0, sensitivity))
+        if self._vad is not None:
+            self._vad.set_mode(self.vad_aggressiveness())
         print(f"Updated sensitivity: {self.sensitivity}")
 
 # Example usage
@@ -320,8 +428,6 @@ if __name__ == "__main__":
                 print(f"Incident detected: {result['type']} ({result['confidence']:.2f})")
                 print(f"Text: {result['details']['text']}")
             
-            time.sleep(0.1)
-            
     except KeyboardInterrupt:
         print("\nStopping voice monitoring...")
         module.stop() 
\ No newline at end of file
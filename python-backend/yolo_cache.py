@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+YOLO Model Cache
+Shares one loaded YOLO model per (weights, device, half) across the whole process.
+Device and precision are part of the key so no caller changes them for another;
+callers must not move or convert a cached model. A YOLO instance is not
+thread-safe (its predictor keeps per-call state), so every caller must hold the
+matching get_yolo_lock() while running the model and pass its full inference
+arguments explicitly on each call.
+"""
+
+import threading
+from typing import Dict, Any, Tuple
+
+_cache: Dict[Tuple[str, Any, bool], Any] = {}
+_locks: Dict[Tuple[str, Any, bool], threading.Lock] = {}
+_lock = threading.Lock()
+
+def get_yolo(name: str, device: Any = 'cpu', half: bool = False):
+    """Return the cached YOLO model for the given weights, device and precision, loading it on first use"""
+    key = (name, device, half)
+    with _lock:
+        model = _cache.get(key)
+        if model is None:
+            from ultralytics import YOLO
+            model = YOLO(name)
+            if device != 'cpu':
+                model.to(f'cuda:{device}' if isinstance(device, int) else device)
+            _cache[key] = model
+            _locks.setdefault(key, threading.Lock())
+        return model
+
+def get_yolo_lock(name: str, device: Any = 'cpu', half: bool = False) -> threading.Lock:
+    """Return the lock that serializes inference on the matching cached model"""
+    with _lock:
+        return _locks.setdefault((name, device, half), threading.Lock())